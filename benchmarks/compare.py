@@ -0,0 +1,115 @@
+"""Benchmark two git revisions with the same harness and flag regressions.
+
+    python -m benchmarks.compare origin/main HEAD --threshold 0.15 -- --jobs 20000
+
+Each revision is checked out into a temporary git worktree and measured with
+this checkout's benchmarks/run.py and data generator, so both sides see the
+same data and load; neither revision needs to contain the harness itself.
+Exits with status 1 when the second revision is slower than the first by more
+than --threshold (p95 latency or throughput) or issues at least half a query
+more per request.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HARNESS_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Concurrent cache misses make query averages jitter slightly; an N+1 adds
+# at least one query per request
+QUERY_TOLERANCE = 0.5
+
+
+def benchmark_revision(revision, run_args, workdir):
+    checkout = os.path.join(workdir, 'tree')
+    output = os.path.join(workdir, 'report.json')
+    subprocess.run(['git', 'worktree', 'add', '--detach', checkout, revision],
+                   cwd=HARNESS_ROOT, check=True, stdout=subprocess.DEVNULL)
+    try:
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.run', '--app-root', checkout,
+             '--output', output] + run_args,
+            cwd=HARNESS_ROOT, check=True
+        )
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', checkout],
+                       cwd=HARNESS_ROOT, check=False)
+    with open(output) as f:
+        return json.load(f)
+
+
+def _change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before
+
+
+def compare(base, head, threshold):
+    rows = []
+    regressions = []
+    for name, old in base['scenarios'].items():
+        new = head['scenarios'].get(name)
+        if new is None:
+            continue
+        latency = _change(old['p95_ms'], new['p95_ms'])
+        throughput = _change(old['throughput_rps'], new['throughput_rps'])
+        old_queries, new_queries = old['queries_per_request'], new['queries_per_request']
+        rows.append((name, old['p95_ms'], new['p95_ms'], latency,
+                     old['throughput_rps'], new['throughput_rps'], throughput,
+                     old_queries, new_queries))
+        if latency is not None and latency > threshold:
+            regressions.append(f'{name}: p95 latency up {latency:.0%}')
+        if throughput is not None and -throughput > threshold:
+            regressions.append(f'{name}: throughput down {-throughput:.0%}')
+        if (old_queries is not None and new_queries is not None
+                and new_queries - old_queries >= QUERY_TOLERANCE):
+            regressions.append(f'{name}: queries/request {old_queries} -> {new_queries}')
+    return rows, regressions
+
+
+def _fmt_change(value):
+    return '   n/a' if value is None else f'{value:+6.0%}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('base', help='baseline revision, e.g. origin/main')
+    parser.add_argument('head', help='candidate revision, e.g. HEAD')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='allowed relative slowdown (default 0.10)')
+    parser.add_argument('--output', help='write both reports and the verdict as JSON')
+    parser.add_argument('run_args', nargs=argparse.REMAINDER,
+                        help='arguments after -- are passed to benchmarks.run')
+    args = parser.parse_args(argv)
+    run_args = [a for a in args.run_args if a != '--']
+
+    reports = {}
+    for label, revision in (('base', args.base), ('head', args.head)):
+        with tempfile.TemporaryDirectory(prefix=f'seagro-bench-{label}-') as workdir:
+            reports[label] = benchmark_revision(revision, run_args, workdir)
+
+    rows, regressions = compare(reports['base'], reports['head'], args.threshold)
+    print(f'{"scenario":<12} {"p95 base":>10} {"p95 head":>10} {"chg":>6} '
+          f'{"rps base":>10} {"rps head":>10} {"chg":>6} {"q/req":>13}')
+    for (name, old_p95, new_p95, latency, old_rps, new_rps, throughput,
+         old_q, new_q) in rows:
+        print(f'{name:<12} {old_p95:>10.2f} {new_p95:>10.2f} {_fmt_change(latency)} '
+              f'{old_rps:>10.2f} {new_rps:>10.2f} {_fmt_change(throughput)} '
+              f'{str(old_q):>6}->{str(new_q):<6}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(dict(reports, regressions=regressions), f, indent=2)
+
+    if regressions:
+        print('\nRegressions:\n  ' + '\n  '.join(regressions))
+        return 1
+    print('\nNo regressions beyond threshold')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+from werkzeug.security import generate_password_hash
+
+from seagro import db
+from seagro.models.user import User
+from seagro.models.job import Job, JobApplication
+# User relates to CourseEnrollment, which older revisions only import from
+# a blueprint they may not register
+import seagro.models.course  # noqa: F401
+
+PASSWORD = 'password123'
+
+# Row templates live here rather than in the checkout's seed_data.py, so
+# every revision benchmarked with this harness gets the same data
+USERS = [
+    {'username': 'john_doe', 'email': 'john@example.com',
+     'first_name': 'John', 'last_name': 'Doe'},
+    {'username': 'jane_smith', 'email': 'jane@example.com',
+     'first_name': 'Jane', 'last_name': 'Smith'}
+]
+
+JOBS = [
+    {
+        'title': 'Senior Python Developer',
+        'company': 'Tech Corp',
+        'location': 'San Francisco, CA',
+        'description': 'Looking for an experienced Python developer...',
+        'requirements': '5+ years of Python experience\nExperience with Flask/Django',
+        'salary': '$120k - $150k'
+    },
+    {
+        'title': 'Frontend Developer',
+        'company': 'Web Solutions',
+        'location': 'Remote',
+        'description': 'Join our team as a frontend developer...',
+        'requirements': '3+ years of React experience\nStrong CSS skills',
+        'salary': '$90k - $120k'
+    }
+]
+
+# Users [0, RESERVED_USERS) never get seeded applications, so benchmark
+# workers can log in as them and apply without hitting duplicates.
+RESERVED_USERS = 64
+
+
+def _batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def generate(users=1000, jobs=10000, applications_per_job=2, batch_size=5000, seed=1):
+    """Populate an empty database with a scaled copy of the row templates.
+
+    Rows are cloned from ``USERS``/``JOBS`` and inserted with
+    executemany batches. Every user shares one password hash, so building a
+    large dataset doesn't spend minutes hashing.
+    """
+    if users <= RESERVED_USERS:
+        raise ValueError(f'users must be greater than {RESERVED_USERS}')
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD)
+
+    user_rows = []
+    for i in range(users):
+        template = USERS[i % len(USERS)]
+        local, domain = template['email'].split('@')
+        user_rows.append({
+            'username': f"{template['username']}_{i}",
+            'email': f'{local}+{i}@{domain}',
+            'password_hash': password_hash,
+            'first_name': template['first_name'],
+            'last_name': template['last_name'],
+            'created_at': now,
+            'is_active': True,
+            'is_admin': False
+        })
+    for batch in _batches(user_rows, batch_size):
+        db.session.execute(insert(User.__table__), batch)
+    user_ids = db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+
+    job_rows = []
+    for i in range(jobs):
+        template = JOBS[i % len(JOBS)]
+        job_rows.append(dict(
+            template,
+            title=f"{template['title']} #{i}",
+            created_at=now - timedelta(minutes=i),
+            author_id=rng.choice(user_ids)
+        ))
+    for batch in _batches(job_rows, batch_size):
+        db.session.execute(insert(Job.__table__), batch)
+    job_ids = db.session.execute(select(Job.id).order_by(Job.id)).scalars().all()
+
+    applicants = user_ids[RESERVED_USERS:]
+    application_rows = []
+    for job_id in job_ids:
+        for applicant_id in rng.sample(applicants, min(applications_per_job, len(applicants))):
+            application_rows.append({
+                'job_id': job_id,
+                'applicant_id': applicant_id,
+                'cover_letter': 'I am very interested in this position... ' * 20,
+                'resume': 'https://example.com/resume.pdf',
+                'status': 'pending',
+                'created_at': now
+            })
+    for batch in _batches(application_rows, batch_size):
+        db.session.execute(insert(JobApplication.__table__), batch)
+
+    db.session.commit()
+
+    try:
+        from seagro.search import job_search
+    except ImportError:
+        pass
+    else:
+        job_search.rebuild()
+
+    # Older revisions have no denormalized counters to fill in
+    try:
+        from seagro.counters import COUNTERS, reconcile
+    except ImportError:
+        pass
+    else:
+        for counter in COUNTERS:
+            reconcile(counter)
+
+    return {
+        'password': PASSWORD,
+        'emails': [row['email'] for row in user_rows[:RESERVED_USERS]],
+        'job_ids': job_ids
+    }
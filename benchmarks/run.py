@@ -0,0 +1,261 @@
+"""Load and latency benchmark for the HTTP API.
+
+Builds a scaled dataset in a throwaway SQLite database, serves the app on a
+local threaded Werkzeug server and drives it with concurrent keep-alive
+clients. Prints (or writes with --output) a JSON report with p50/p95/p99
+latency, throughput and SQL queries per request for each scenario.
+
+    python -m benchmarks.run --jobs 20000 --concurrency 8 --requests 2000
+
+Use --app-root to benchmark another checkout with this harness; that is how
+benchmarks/compare.py measures two git revisions.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+
+SCENARIOS = ('jobs_list', 'job_detail', 'login', 'apply')
+SCENARIO_HEADER = 'X-Benchmark-Scenario'
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(int(round(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class Client:
+    def __init__(self, host, port):
+        self.conn = HTTPConnection(host, port, timeout=60)
+        self.cookie = None
+
+    def request(self, method, path, scenario, payload=None):
+        headers = {SCENARIO_HEADER: scenario}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        response.read()
+        set_cookie = response.getheader('Set-Cookie')
+        if set_cookie:
+            cookie = SimpleCookie(set_cookie)
+            if 'session' in cookie:
+                self.cookie = 'session=' + cookie['session'].value
+        return response.status
+
+    def login(self, email, password, scenario='setup', attempts=10):
+        # Workers log in together, so the password hasher may shed some of
+        # them with 429 Retry-After: 1
+        for _ in range(attempts):
+            status = self.request('POST', '/auth/login', scenario,
+                                  {'email': email, 'password': password})
+            if status != 429:
+                return status
+            time.sleep(1)
+        return status
+
+    def close(self):
+        self.conn.close()
+
+
+def build_app(database_uri):
+    from config import Config
+    from seagro import create_app, db
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_uri
+        TESTING = False
+        DEBUG = False
+        RATELIMIT_ENABLED = False  # the load comes from a handful of clients
+
+    app = create_app(BenchmarkConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def instrument(app, query_counts):
+    # Older revisions may predate the query counter; report no counts then
+    try:
+        from seagro.querycount import count_queries
+    except ImportError:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_counting():
+        g._benchmark_counting = count_queries()
+        g._benchmark_counter = g._benchmark_counting.__enter__()
+
+    @app.teardown_request
+    def _stop_counting(exc):
+        counting = g.pop('_benchmark_counting', None)
+        if counting is not None:
+            counting.__exit__(None, None, None)
+            scenario = request.headers.get(SCENARIO_HEADER, 'unknown')
+            query_counts[scenario].append(g._benchmark_counter.count)
+
+
+def serve(app):
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_scenario(name, host, port, dataset, requests, concurrency, seed):
+    job_ids = dataset['job_ids']
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = Client(host, port)
+        email, password = dataset['emails'][index], dataset['password']
+        if name == 'apply':
+            client.login(email, password)
+            # Each worker applies to its own slice of jobs: no duplicates
+            targets = iter(job_ids[index::concurrency])
+        local_latencies = []
+        local_statuses = Counter()
+        for _ in range(requests // concurrency):
+            if name == 'jobs_list':
+                page = rng.randint(1, 20)
+                call = ('GET', f'/api/jobs?page={page}&per_page=20', None)
+            elif name == 'job_detail':
+                call = ('GET', f'/api/jobs/{rng.choice(job_ids)}', None)
+            elif name == 'login':
+                call = ('POST', '/auth/login', {'email': email, 'password': password})
+            else:
+                call = ('POST', f'/api/jobs/{next(targets)}/apply',
+                        {'cover_letter': 'Benchmark cover letter', 'resume': 'cv.pdf'})
+            started = time.perf_counter()
+            status = client.request(call[0], call[1], name, call[2])
+            local_latencies.append(time.perf_counter() - started)
+            local_statuses[status] += 1
+        client.close()
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(n for status, n in statuses.items() if status >= 400),
+        'statuses': {str(status): n for status, n in sorted(statuses.items())},
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def git_revision(path):
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=path,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--app-root', default=None,
+                        help='checkout to benchmark (default: this one)')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--jobs', type=int, default=10000)
+    parser.add_argument('--applications-per-job', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report here')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app_root = os.path.abspath(args.app_root or os.path.join(os.path.dirname(__file__), '..'))
+    sys.path.insert(0, app_root)
+
+    from benchmarks import datagen
+
+    if args.concurrency > datagen.RESERVED_USERS:
+        sys.exit(f'--concurrency is limited to {datagen.RESERVED_USERS}')
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f'unknown scenarios: {", ".join(sorted(unknown))}')
+    if 'apply' in scenarios and args.requests > args.jobs:
+        sys.exit('the apply scenario needs at least as many jobs as requests')
+
+    with tempfile.TemporaryDirectory(prefix='seagro-bench-') as tmp:
+        app = build_app('sqlite:///' + os.path.join(tmp, 'bench.db'))
+        query_counts = defaultdict(list)
+        instrument(app, query_counts)
+
+        with app.app_context():
+            started = time.perf_counter()
+            dataset = datagen.generate(users=args.users, jobs=args.jobs,
+                                       applications_per_job=args.applications_per_job,
+                                       seed=args.seed)
+            seed_seconds = time.perf_counter() - started
+
+        server = serve(app)
+        host, port = server.server_address[:2]
+        report = {
+            'revision': git_revision(app_root),
+            'parameters': vars(args),
+            'seed_seconds': round(seed_seconds, 3),
+            'scenarios': {}
+        }
+        try:
+            for name in scenarios:
+                result = run_scenario(name, host, port, dataset, args.requests,
+                                      args.concurrency, args.seed)
+                counts = query_counts.pop(name, None)
+                result['queries_per_request'] = \
+                    round(sum(counts) / len(counts), 3) if counts else None
+                report['scenarios'][name] = result
+                print(f'{name}: {result}', file=sys.stderr)
+        finally:
+            server.shutdown()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return report
+
+
+if __name__ == '__main__':
+    main()
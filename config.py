@@ -13,26 +13,192 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'seagro.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Engine profile: 'auto' picks 'sqlite-wal' or 'postgres' from the URL;
+    # 'default' leaves SQLAlchemy's defaults alone (see seagro/database.py)
+    DB_PROFILE = os.environ.get('DB_PROFILE') or 'auto'
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_TIMEOUT = 10  # seconds to wait for a connection (or SQLite lock)
+    DB_POOL_RECYCLE = 1800  # seconds
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS') or 0) or None
+    # GET/HEAD requests read from this database when set
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    
+    # Fast boot: defer Mail/SocketIO/Migrate until first use and check the
+    # Alembic revision instead of running create_all ('warn', 'error', 'off')
+    FAST_BOOT = os.environ.get('FAST_BOOT') is not None
+    SCHEMA_CHECK = os.environ.get('SCHEMA_CHECK') or 'warn'
+    MIGRATIONS_DIR = os.path.join(basedir, 'migrations')  # relative paths start at app.root_path
+    
+    # Caching: 'SimpleCache' is per process; set CACHE_TYPE=RedisCache to share
+    # entries (and invalidations) between workers through REDIS_URL
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'SimpleCache'
+    CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_KEY_PREFIX = 'seagro:'
+    RESPONSE_CACHE_ENABLED = True
+    
+    # Fail views that exceed their @query_budget; None enforces it only in
+    # debug and testing
+    QUERY_BUDGETS_ENFORCED = None
+    
+    # Instrumentation: /metrics, Server-Timing and sampled cProfile dumps
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED') is not None
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # else /metrics is admin-only
+    SERVER_TIMING_ENABLED = True
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+    PROFILE_SLOW_REQUEST_MS = 500
+    PROFILE_DIR = os.path.join(basedir, 'profiles')
+    PROFILE_MAX_FILES = 50
+    
+    # Pagination
+    JOBS_TOTAL_CACHE_TIMEOUT = 60  # seconds a cached job count stays valid
+    
+    # Bulk job import (POST /api/jobs/bulk)
+    JOB_IMPORT_BATCH_SIZE = 1000
+    JOB_IMPORT_MAX_BATCH_SIZE = 10000
+    JOB_IMPORT_LOCK_TIMEOUT = 600  # seconds; imports run one at a time
+    
+    # Bytes written per chunk when serving course content
+    COURSE_CONTENT_CHUNK_SIZE = 65536
+    
+    # Course progress is buffered and written in batches every
+    # PROGRESS_FLUSH_INTERVAL seconds (see seagro/progress.py); use 'redis'
+    # storage to share the buffer between workers
+    PROGRESS_BUFFER_ENABLED = True
+    PROGRESS_BUFFER_THREAD = True  # flush from a thread in each process
+    PROGRESS_STORAGE = os.environ.get('PROGRESS_STORAGE') or 'memory'
+    PROGRESS_FLUSH_INTERVAL = 10  # seconds
+    PROGRESS_MAX_BATCH_SIZE = 100  # updates accepted per request
+    
+    # Rows fetched per round trip when streaming application exports
+    APPLICATION_EXPORT_CHUNK_SIZE = 500
+    # Application ids accepted by one bulk status change
+    APPLICATION_STATUS_MAX_IDS = 1000
+    
+    # Home timelines (see seagro/timelines.py): capped lists of post ids per
+    # user, filled on write except for authors with TIMELINE_FANOUT_LIMIT or
+    # more followers. Use 'redis' storage to share them between workers;
+    # per-process 'memory' timelines are rebuilt after TIMELINE_MEMORY_TTL
+    # seconds, so posts fanned out by other workers show up by then.
+    TIMELINE_STORAGE = os.environ.get('TIMELINE_STORAGE') or 'memory'
+    TIMELINE_MEMORY_TTL = 60
+    TIMELINE_TTL = 86400  # redis timelines
+    TIMELINE_MAX_LENGTH = 800
+    TIMELINE_FANOUT_LIMIT = 10000
+    
+    # Job search: 'auto' uses SQLite FTS5 on SQLite, the in-memory index elsewhere
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto'
+    # The in-memory index loads in the background at startup; searches wait
+    # SEARCH_LOAD_TIMEOUT seconds for it, then get a 503. Every
+    # SEARCH_SYNC_INTERVAL seconds it looks for jobs other workers added.
+    SEARCH_PRELOAD = True
+    SEARCH_SYNC_INTERVAL = 5
+    SEARCH_LOAD_TIMEOUT = 1
+    
+    # Token-bucket rate limits, '<scope>:<key>' -> 'N/second|minute|hour|day'
+    # (see seagro/ratelimit.py). Use 'redis' storage to share buckets
+    # between workers.
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE') or 'memory'
+    RATELIMITS = {
+        'login:ip': '20/minute',
+        'login:account': '5/minute',
+        'register:ip': '10/hour',
+        'refresh:ip': '30/minute',
+        'write:user': '120/minute',
+    }
+    
+    # Identity cache used by the Flask-Login user loader
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 60  # seconds
+    
+    # Password hashing (see seagro/hashing.py)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt'
+    PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR') or 'process'
+    PASSWORD_HASH_WORKERS = None  # defaults to the CPU count
+    PASSWORD_HASH_QUEUE_SIZE = None  # defaults to 4 per worker
+    PASSWORD_HASH_TIMEOUT = 10  # seconds
+    
     # Mail settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') is not None
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'Seagro <noreply@seagro.local>'
+    
+    # Outbound mail queue (see seagro/mailqueue.py); without the in-process
+    # thread, run `flask mail-worker` instead
+    MAIL_QUEUE_THREAD = True
+    MAIL_QUEUE_BATCH_SIZE = 50  # messages sent per SMTP connection
+    MAIL_QUEUE_POLL_INTERVAL = 30  # seconds
+    MAIL_QUEUE_MAX_ATTEMPTS = 5
+    MAIL_QUEUE_RETRY_BACKOFF = 30  # seconds, doubled after each failed attempt
+    MAIL_QUEUE_MAX_BACKOFF = 3600
+    MAIL_QUEUE_CLAIM_TIMEOUT = 300  # seconds before a crashed worker's batch is retried
     
     # AWS S3 settings
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
     AWS_BUCKET_NAME = os.environ.get('AWS_BUCKET_NAME')
     
-    # JWT settings
+    # Media uploads (see seagro/media): 'local' keeps files in MEDIA_ROOT,
+    # 's3' uses AWS_BUCKET_NAME (MEDIA_S3_ENDPOINT_URL for MinIO and other
+    # stand-ins; needs boto3). Local files should be served by the web
+    # server, either at MEDIA_URL (checking the signature) or through
+    # MEDIA_ACCEL_REDIRECT (an nginx internal location over MEDIA_ROOT).
+    MEDIA_STORAGE = os.environ.get('MEDIA_STORAGE') or 'local'
+    MEDIA_ROOT = os.environ.get('MEDIA_ROOT') or os.path.join(basedir, 'media')
+    MEDIA_URL = os.environ.get('MEDIA_URL')
+    MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT')
+    MEDIA_URL_EXPIRES = 3600  # seconds a signed download URL stays valid
+    MEDIA_S3_BUCKET = AWS_BUCKET_NAME
+    MEDIA_S3_ENDPOINT_URL = os.environ.get('MEDIA_S3_ENDPOINT_URL')
+    MEDIA_S3_REGION = os.environ.get('AWS_REGION')
+    MEDIA_PART_SIZE = 8 * 1024 * 1024  # suggested to clients; S3 wants 5 MiB or more but for the last part
+    MEDIA_MAX_PART_SIZE = 64 * 1024 * 1024
+    MEDIA_MAX_SIZE = 1024 * 1024 * 1024
+    MEDIA_UPLOAD_EXPIRES = 86400  # `flask abort-stale-uploads` cleans up after this
+    MEDIA_CONTENT_TYPES = {
+        'image/jpeg': '.jpg',
+        'image/png': '.png',
+        'image/gif': '.gif',
+        'image/webp': '.webp',
+        'video/mp4': '.mp4',
+        'video/webm': '.webm',
+        'video/quicktime': '.mov',
+    }
+    # Thumbnails (with Pillow) and transcodes (with ffmpeg) run on this pool
+    MEDIA_PROCESSING_EXECUTOR = 'thread'
+    MEDIA_WORKERS = 2
+    
+    # JWT settings (bearer tokens, see seagro/tokens.py). Revocations are
+    # kept in the cache, so use a shared CACHE_TYPE with several workers.
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')  # defaults to SECRET_KEY
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour
+    JWT_REFRESH_TOKEN_EXPIRES = 14400  # 4 hours; single use, replaced on each refresh
     
     # Redis settings (for SocketIO)
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
+    # Set (e.g. to REDIS_URL) when running several workers so an emit from
+    # any of them reaches sockets held by the others (needs the redis package)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    
+    # Real-time notifications (see seagro/notifications.py)
+    NOTIFICATIONS_ENABLED = True
+    NOTIFICATION_COALESCE_MS = 250  # bursts inside this window go out as one emit
+    CACHE_REDIS_URL = REDIS_URL
+    RATELIMIT_REDIS_URL = REDIS_URL
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
     SERVER_NAME = 'localhost.localdomain'
+    PASSWORD_HASH_EXECUTOR = 'inline'
+    FAST_BOOT = True
+    SCHEMA_CHECK = 'off'  # tests build their schema with create_all
+    MAIL_QUEUE_THREAD = False  # tests call seagro.mailqueue.deliver()
+    PROGRESS_BUFFER_THREAD = False  # tests call progress_buffer.flush()
+    SEARCH_LOAD_TIMEOUT = 5
+    MEDIA_PROCESSING_EXECUTOR = 'inline'
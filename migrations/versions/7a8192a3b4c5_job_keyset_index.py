@@ -0,0 +1,28 @@
+"""job keyset index
+
+Revision ID: 7a8192a3b4c5
+Revises: 6f708192a3b4
+Create Date: 2026-10-18 13:00:27.528153
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a8192a3b4c5'
+down_revision = '6f708192a3b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases stamped at 1a2b3c4d5e6f were built by create_all() at boot,
+    # so they have this index when the app that built them already declared
+    # it on Job, and lack it otherwise
+    op.create_index('ix_job_created_at_id', 'job', ['created_at', 'id'], unique=False,
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_job_created_at_id', table_name='job')
@@ -1,6 +1,7 @@
-from seagro import create_app, socketio
+from seagro import create_app, init_extension
 
 app = create_app()
+socketio = init_extension('socketio', app)
 
 if __name__ == '__main__':
     socketio.run(app, debug=True, port=5001, allow_unsafe_werkzeug=True)
@@ -1,35 +1,118 @@
-from flask import Flask
+import importlib
+import os
+import sys
+import threading
+
+from flask import Flask, current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_socketio import SocketIO
-from flask_mail import Mail
 from flask_caching import Cache
 from flask_cors import CORS
-from flask_migrate import Migrate
 from config import Config, TestingConfig
+from seagro.database import (RoutingSession, check_schema, configure_engines,
+                             install_engine_hooks, migrations_dir)
 
-db = SQLAlchemy()
-socketio = SocketIO()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
-mail = Mail()
-migrate = Migrate()
-cache = Cache(config={
-    'CACHE_TYPE': 'SimpleCache',
-    'CACHE_DEFAULT_TIMEOUT': 300
-})
+cache = Cache()
+
+
+def _init_socketio(socketio, app):
+    from seagro.notifications import register_socket_handlers
+    register_socket_handlers(socketio)
+    socketio.init_app(app, cors_allowed_origins="*",
+                      message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+
+
+# socketio, mail and migrate are built on first access (see __getattr__) so a
+# fast boot never imports Flask-SocketIO, Flask-Mail or Alembic
+_LAZY_EXTENSIONS = {
+    'socketio': ('flask_socketio', 'SocketIO', _init_socketio),
+    'mail': ('flask_mail', 'Mail', lambda ext, app: ext.init_app(app)),
+    'migrate': ('flask_migrate', 'Migrate',
+                lambda ext, app: ext.init_app(app, db, directory=migrations_dir(app))),
+}
+_extension_lock = threading.Lock()
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXTENSIONS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module, cls, _ = _LAZY_EXTENSIONS[name]
+    with _extension_lock:
+        if name not in globals():
+            globals()[name] = getattr(importlib.import_module(module), cls)()
+    return globals()[name]
+
+
+def init_extension(name, app=None):
+    """Return the lazy extension ``name``, initialized on ``app`` if needed."""
+    app = app or current_app._get_current_object()
+    extension = getattr(sys.modules[__name__], name)
+    if name not in app.extensions:
+        with _extension_lock:
+            if name not in app.extensions:
+                _LAZY_EXTENSIONS[name][2](extension, app)
+    return extension
+
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    fast_boot = app.config.get('FAST_BOOT', False)
+
+    from seagro.serializers import JSONProvider
+    app.json = JSONProvider(app)
 
     # Initialize extensions
+    configure_engines(app)
     db.init_app(app)
     login_manager.init_app(app)
-    mail.init_app(app)
     CORS(app)
-    migrate.init_app(app, db)
-    socketio.init_app(app, cors_allowed_origins="*")
     cache.init_app(app)
+    if not fast_boot:
+        init_extension('mail', app)
+        init_extension('socketio', app)
+    # The flask CLI always needs Migrate for `flask db`
+    if not fast_boot or os.environ.get('FLASK_RUN_FROM_CLI'):
+        init_extension('migrate', app)
+
+    from seagro.hashing import password_hasher
+    password_hasher.init_app(app)
+
+    from seagro.ratelimit import rate_limiter
+    rate_limiter.init_app(app)
+
+    from seagro.identity import user_cache
+    user_cache.init_app(app)
+
+    from seagro.tokens import token_auth
+    token_auth.init_app(app)
+
+    from seagro.search import job_search
+    job_search.init_app(app)
+
+    from seagro.mailqueue import mail_queue
+    mail_queue.init_app(app)
+
+    from seagro.progress import progress_buffer
+    progress_buffer.init_app(app)
+
+    from seagro.media import media
+    media.init_app(app)
+
+    from seagro.timelines import timelines
+    timelines.init_app(app)
+
+    from seagro.notifications import notifier
+    notifier.init_app(app)
+
+    from seagro.counters import reconcile_counters
+    app.cli.add_command(reconcile_counters)
+
+    from seagro.metrics import metrics
+    metrics.init_app(app)
+    install_engine_hooks(app, db)
 
     # Register blueprints
     from seagro.api import bp as api_bp
@@ -38,8 +121,10 @@ def create_app(config_class=Config):
     from seagro.auth import bp as auth_bp
     app.register_blueprint(auth_bp, url_prefix='/auth')
 
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    if fast_boot:
+        check_schema(app, db)
+    else:
+        with app.app_context():
+            db.create_all()
 
     return app
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 bp = Blueprint('api', __name__)
 
-from seagro.api import jobs, users
+from seagro.api import jobs, job_import, users, courses, posts, media
@@ -1,62 +1,152 @@
-from flask import Blueprint, jsonify, request
+from flask import Response, abort, current_app, jsonify, request, stream_with_context
 from flask_login import login_required, current_user
 from seagro import db
+from seagro.api import bp
+from seagro.caching import cached_response, invalidate
+from seagro.counters import increment
 from seagro.models.course import Course, CourseEnrollment
+from seagro.progress import enrolled, progress_buffer
+from seagro.querycount import query_budget
+from seagro.ratelimit import by_user, rate_limit
+from seagro.serializers import COURSE_DETAIL, COURSE_SUMMARY
+from sqlalchemy import LargeBinary, cast, func, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import ContentRange
 
-bp = Blueprint('courses', __name__)
+# Columns a client may add with ?include=
+LISTING_INCLUDES = ('description',)
+DETAIL_INCLUDES = ('content',)
+
+def _included(allowed):
+    requested = request.args.get('include', '')
+    return tuple(field for field in allowed if field in requested.split(','))
 
 @bp.route('/courses', methods=['GET'])
+@query_budget(2)
+@cached_response('courses')
 def get_courses():
-    courses = Course.query.all()
-    return jsonify([{
-        'id': c.id,
-        'title': c.title,
-        'description': c.description
-    } for c in courses])
+    page = request.args.get('page', 1, type=int)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    
+    schema = COURSE_SUMMARY.extend(*_included(LISTING_INCLUDES))
+    courses = db.session.query(*schema.columns())\
+        .order_by(Course.id)\
+        .paginate(page=page, per_page=per_page)
+    
+    return jsonify({
+        'courses': schema.dump_many(courses.items),
+        'total': courses.total,
+        'pages': courses.pages,
+        'current_page': courses.page
+    })
 
 @bp.route('/courses/<int:id>', methods=['GET'])
+@query_budget(1)
+@cached_response('course:{id}')
 def get_course(id):
-    course = Course.query.get_or_404(id)
-    return jsonify({
-        'id': course.id,
-        'title': course.title,
-        'description': course.description,
-        'content': course.content
-    })
+    schema = COURSE_DETAIL.extend(*_included(DETAIL_INCLUDES))
+    course = db.session.execute(schema.select().where(Course.id == id)).first()
+    if course is None:
+        abort(404)
+    return jsonify(schema.dump(course))
+
+def _content_bytes():
+    # Ranges are over the UTF-8 bytes
+    if db.engine.dialect.name == 'postgresql':
+        return func.convert_to(Course.content, 'UTF8')
+    return cast(Course.content, LargeBinary)
+
+def _read_chunks(id, start, stop, chunk_size):
+    # One substr() per chunk, so a large range is never held in memory whole
+    for offset in range(start, stop, chunk_size):
+        yield db.session.scalar(
+            select(func.substr(_content_bytes(), offset + 1, min(chunk_size, stop - offset)))
+            .where(Course.id == id)
+        ) or b''
+
+@bp.route('/courses/<int:id>/content', methods=['GET'])
+def get_course_content(id):
+    size = db.session.scalar(select(func.length(_content_bytes())).where(Course.id == id))
+    if size is None:
+        abort(404)
+    
+    # Multi-range requests aren't supported; they get the whole body
+    start, stop, status = 0, size, 200
+    if request.range is not None and len(request.range.ranges) == 1:
+        bounds = request.range.range_for_length(size)
+        if bounds is None:
+            response = Response(status=416)
+            response.content_range = ContentRange('bytes', None, None, size)
+            return response
+        (start, stop), status = bounds, 206
+    
+    chunk_size = current_app.config['COURSE_CONTENT_CHUNK_SIZE']
+    response = Response(stream_with_context(_read_chunks(id, start, stop, chunk_size)),
+                        status=status, mimetype='text/plain')
+    response.content_length = stop - start
+    response.accept_ranges = 'bytes'
+    if status == 206:
+        response.content_range = ContentRange('bytes', start, stop, size)
+    return response
 
 @bp.route('/courses/<int:id>/enroll', methods=['POST'])
 @login_required
+@rate_limit('write', by_user)
 def enroll_course(id):
     course = Course.query.get_or_404(id)
     
-    # Check if already enrolled
-    existing = CourseEnrollment.query.filter_by(
-        user_id=current_user.id,
-        course_id=course.id
-    ).first()
-    
-    if existing:
-        return jsonify({'message': 'Already enrolled'}), 400
-        
+    # uq_course_enrollment_user_course rejects a second enrollment
     enrollment = CourseEnrollment(user_id=current_user.id, course_id=course.id)
     db.session.add(enrollment)
-    db.session.commit()
+    try:
+        increment('course.enrollment_count', course.id)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'message': 'Already enrolled'}), 400
+    invalidate('courses', f'course:{course.id}')
     
     return jsonify({'message': 'Enrolled successfully'})
 
+def _valid_progress(value):
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 100
+
 @bp.route('/courses/<int:id>/progress', methods=['POST'])
 @login_required
+@rate_limit('write', by_user)
 def update_progress(id):
     progress = request.json.get('progress')
-    if not progress or not isinstance(progress, int) or progress < 0 or progress > 100:
+    if not _valid_progress(progress):
         return jsonify({'error': 'Invalid progress value'}), 400
-        
-    enrollment = CourseEnrollment.query.filter_by(
-        user_id=current_user.id,
-        course_id=id
-    ).first_or_404()
     
-    enrollment.progress = progress
-    db.session.commit()
+    if not enrolled(current_user.id, [id]):
+        abort(404)
+    progress_buffer.record({(current_user.id, id): progress})
+    
+    return jsonify({'message': 'Progress updated'})
+
+@bp.route('/courses/progress', methods=['POST'])
+@login_required
+@rate_limit('write', by_user)
+def update_progress_batch():
+    updates = (request.get_json(silent=True) or {}).get('updates')
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'error': 'Expected a non-empty list of updates'}), 400
+    if len(updates) > current_app.config['PROGRESS_MAX_BATCH_SIZE']:
+        return jsonify({'error': 'Too many updates in one request'}), 400
+    
+    # Later entries for the same course win
+    latest = {}
+    for entry in updates:
+        if not isinstance(entry, dict) or not isinstance(entry.get('course_id'), int) \
+                or not _valid_progress(entry.get('progress')):
+            return jsonify({'error': 'Invalid progress value'}), 400
+        latest[entry['course_id']] = entry['progress']
+    
+    not_enrolled = sorted(latest.keys() - enrolled(current_user.id, latest))
+    if not_enrolled:
+        return jsonify({'error': 'Not enrolled', 'course_ids': not_enrolled}), 404
+    progress_buffer.record({(current_user.id, course_id): progress
+                            for course_id, progress in latest.items()})
     
-    return jsonify({'message': 'Progress updated'})
\ No newline at end of file
+    return jsonify({'message': 'Progress updated', 'updated': len(latest)})
@@ -0,0 +1,179 @@
+import json
+from types import SimpleNamespace
+
+from flask import current_app, jsonify, request
+from flask_login import login_required, current_user
+from sqlalchemy import and_, insert, or_, select, tuple_
+from seagro.api import bp
+from seagro.api.jobs import JOBS_TOTAL_CACHE_KEY
+from seagro.caching import invalidate
+from seagro.models.job import Job
+from seagro.ratelimit import by_user, rate_limit
+from seagro.search import job_search
+from seagro import db, cache
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+
+IMPORT_LOCK_KEY = 'jobs:import:lock'
+
+# field -> (required, max length)
+JOB_FIELDS = {
+    'title': (True, Job.title.type.length),
+    'company': (True, Job.company.type.length),
+    'description': (True, None),
+    'location': (False, Job.location.type.length),
+    'requirements': (False, None),
+    'salary': (False, Job.salary.type.length),
+}
+
+def _validate(data):
+    if not isinstance(data, dict):
+        return None, ['Row must be a JSON object']
+    errors = []
+    row = {}
+    for field, (required, max_length) in JOB_FIELDS.items():
+        value = data.get(field)
+        if value is None or value == '':
+            if required:
+                errors.append(f'{field} is required')
+            row[field] = None
+        elif not isinstance(value, str):
+            errors.append(f'{field} must be a string')
+        elif max_length and len(value) > max_length:
+            errors.append(f'{field} must be at most {max_length} characters')
+        else:
+            row[field] = value
+    return row, errors
+
+def _dedupe_key(row):
+    return (row['company'], row['title'], row['location'])
+
+def _existing_keys(keys):
+    # NULL never compares equal inside a row-value IN, so match jobs without
+    # a location separately
+    with_location = [key for key in keys if key[2] is not None]
+    without_location = [key[:2] for key in keys if key[2] is None]
+    clauses = []
+    if with_location:
+        clauses.append(tuple_(Job.company, Job.title, Job.location).in_(with_location))
+    if without_location:
+        clauses.append(and_(Job.location.is_(None),
+                            tuple_(Job.company, Job.title).in_(without_location)))
+    rows = db.session.execute(
+        select(Job.company, Job.title, Job.location).where(or_(*clauses))
+    )
+    return {tuple(row) for row in rows}
+
+class _Importer:
+    def __init__(self, author_id, batch_size):
+        self.author_id = author_id
+        self.batch_size = batch_size
+        self.results = []
+        self.seen = set()
+        self.pending = []  # (result, row)
+        self.created = 0
+
+    def reject(self, errors):
+        self.results.append({'row': len(self.results), 'status': 'invalid', 'errors': errors})
+
+    def add(self, data):
+        row, errors = _validate(data)
+        if errors:
+            self.reject(errors)
+            return
+        result = {'row': len(self.results)}
+        self.results.append(result)
+        key = _dedupe_key(row)
+        if key in self.seen:
+            result['status'] = 'duplicate'
+            return
+        self.seen.add(key)
+        row['author_id'] = self.author_id
+        self.pending.append((result, row))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+
+        existing = _existing_keys([_dedupe_key(row) for _, row in batch])
+        fresh = []
+        for result, row in batch:
+            if _dedupe_key(row) in existing:
+                result['status'] = 'duplicate'
+            else:
+                fresh.append((result, row))
+        if not fresh:
+            return
+
+        # One executemany per batch; RETURNING keeps ids in row order
+        rows = [row for _, row in fresh]
+        ids = db.session.scalars(
+            insert(Job).returning(Job.id, sort_by_parameter_order=True), rows
+        ).all()
+        # Indexed batch by batch, in the same transaction, so nothing but
+        # the per-row results outlives the batch
+        job_search.index([SimpleNamespace(id=id, **row) for row, id in zip(rows, ids)])
+        db.session.commit()
+
+        for (result, _), id in zip(fresh, ids):
+            result.update(status='created', id=id)
+        self.created += len(ids)
+
+    def finish(self):
+        self.flush()
+        if self.created:
+            cache.delete(JOBS_TOTAL_CACHE_KEY)
+            invalidate('jobs')
+
+def _ndjson_rows(importer):
+    # Read the body a line at a time so large feeds are never held in memory
+    for line in iter(request.stream.readline, b''):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            importer.reject(['Malformed JSON line'])
+            continue
+        yield data
+
+@bp.route('/jobs/bulk', methods=['POST'])
+@login_required
+@rate_limit('write', by_user)
+def import_jobs():
+    max_batch = current_app.config['JOB_IMPORT_MAX_BATCH_SIZE']
+    batch_size = request.args.get('batch_size', current_app.config['JOB_IMPORT_BATCH_SIZE'], type=int)
+    batch_size = min(max(batch_size, 1), max_batch)
+
+    importer = _Importer(current_user.id, batch_size)
+    if request.mimetype in NDJSON_MIMETYPES:
+        rows = _ndjson_rows(importer)
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            return jsonify({'error': 'Expected a JSON array or NDJSON body'}), 400
+
+    # Duplicates are found by reading before each insert, with no unique
+    # index behind it, so two imports at once could both insert a row. One
+    # import runs at a time (across workers with a shared CACHE_TYPE).
+    if not cache.add(IMPORT_LOCK_KEY, current_user.id,
+                     timeout=current_app.config['JOB_IMPORT_LOCK_TIMEOUT']):
+        return jsonify({'error': 'Another import is running, retry shortly'}), 409
+    try:
+        for data in rows:
+            importer.add(data)
+        importer.finish()
+    finally:
+        cache.delete(IMPORT_LOCK_KEY)
+
+    statuses = [result['status'] for result in importer.results]
+    return jsonify({
+        'created': statuses.count('created'),
+        'duplicates': statuses.count('duplicate'),
+        'invalid': statuses.count('invalid'),
+        'results': importer.results
+    })
@@ -1,34 +1,126 @@
-from flask import jsonify, request
+import csv
+import io
+from datetime import datetime
+from flask import Response, abort, current_app, jsonify, request, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from seagro.api import bp
-from seagro.models.job import Job, JobApplication
-from seagro import db
+from seagro.caching import cached_response, invalidate
+from seagro.counters import increment
+from seagro.database import use_primary
+from seagro.api.pagination import InvalidCursor, decode_cursor, encode_cursor
+from seagro.mailqueue import mail_queue
+from seagro.models.job import APPLICATION_STATUSES, Job, JobApplication
+from seagro.models.user import User
+from seagro.notifications import notifier
+from seagro.querycount import query_budget
+from seagro.ratelimit import by_user, rate_limit
+from seagro.search import job_search
+from seagro.serializers import APPLICATION, JOB_DETAIL, JOB_SUMMARY
+from seagro import db, cache
+
+JOBS_TOTAL_CACHE_KEY = 'jobs:total'
+
+def _cached_job_total():
+    total = cache.get(JOBS_TOTAL_CACHE_KEY)
+    if total is None:
+        with use_primary(db.session):
+            total = db.session.query(func.count(Job.id)).scalar()
+        cache.set(JOBS_TOTAL_CACHE_KEY, total,
+                  timeout=current_app.config['JOBS_TOTAL_CACHE_TIMEOUT'])
+    return total
+
+def _parse_bool(value):
+    return value.lower() in ('1', 'true', 'yes')
 
 @bp.route('/jobs', methods=['GET'])
+@query_budget(2)
+@cached_response('jobs')
 def get_jobs():
+    if 'cursor' in request.args:
+        return _get_jobs_keyset()
+
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     
-    jobs = Job.query.order_by(Job.created_at.desc())\
+    jobs = db.session.query(*JOB_SUMMARY.columns())\
+        .order_by(Job.created_at.desc(), Job.id.desc())\
         .paginate(page=page, per_page=per_page)
     
     return jsonify({
-        'jobs': [{
-            'id': job.id,
-            'title': job.title,
-            'company': job.company,
-            'location': job.location,
-            'salary': job.salary,
-            'requirements': job.requirements,
-            'created_at': job.created_at.isoformat()
-        } for job in jobs.items],
+        'jobs': JOB_SUMMARY.dump_many(jobs.items),
         'total': jobs.total,
         'pages': jobs.pages,
         'current_page': jobs.page
     })
 
+def _get_jobs_keyset():
+    # Seek past the last (created_at, id) seen instead of OFFSET-scanning,
+    # so every page is a bounded range read on ix_job_created_at_id.
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), 100)
+
+    query = JOB_SUMMARY.select().order_by(Job.created_at.desc(), Job.id.desc())
+
+    token = request.args.get('cursor')
+    if token:
+        try:
+            created_at, last_id = decode_cursor(token, datetime, int)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.where(tuple_(Job.created_at, Job.id) < (created_at, last_id))
+
+    # Fetch one extra row to learn whether another page exists
+    jobs = db.session.execute(query.limit(per_page + 1)).all()
+    has_more = len(jobs) > per_page
+    jobs = jobs[:per_page]
+
+    response = {
+        'jobs': JOB_SUMMARY.dump_many(jobs),
+        'next_cursor': encode_cursor(jobs[-1].created_at, jobs[-1].id) if has_more else None
+    }
+    if request.args.get('include_total', type=_parse_bool):
+        response['total'] = _cached_job_total()
+
+    return jsonify(response)
+
+@bp.route('/jobs/search', methods=['GET'])
+@query_budget(3)
+def search_jobs():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), 100)
+
+    results = job_search.search(
+        query,
+        location=request.args.get('location'),
+        company=request.args.get('company'),
+        limit=per_page,
+        offset=(page - 1) * per_page
+    )
+
+    # Hydrate the ranked ids in one query, then restore rank order
+    scores = dict(results)
+    jobs = JOB_SUMMARY.dump_many(db.session.execute(
+        JOB_SUMMARY.select().where(Job.id.in_(scores))
+    )) if scores else []
+    for job in jobs:
+        job['score'] = scores[job['id']]
+    jobs.sort(key=lambda job: job['score'], reverse=True)
+
+    return jsonify({
+        'jobs': jobs,
+        'query': query,
+        'current_page': page
+    })
+
 @bp.route('/jobs', methods=['POST'])
 @login_required
+@rate_limit('write', by_user)
 def create_job():
     data = request.get_json()
     
@@ -46,7 +138,11 @@ def create_job():
     )
     
     db.session.add(job)
+    db.session.flush()
+    job_search.index([job])
     db.session.commit()
+    cache.delete(JOBS_TOTAL_CACHE_KEY)
+    invalidate('jobs')
     
     return jsonify({
         'message': 'Job created successfully',
@@ -54,38 +150,30 @@ def create_job():
     }), 201
 
 @bp.route('/jobs/<int:id>', methods=['GET'])
+@query_budget(1)
+@cached_response('job:{id}')
 def get_job(id):
-    job = Job.query.get_or_404(id)
-    
-    return jsonify({
-        'id': job.id,
-        'title': job.title,
-        'company': job.company,
-        'location': job.location,
-        'description': job.description,
-        'requirements': job.requirements,
-        'salary': job.salary,
-        'created_at': job.created_at.isoformat(),
-        'author': {
-            'id': job.author.id,
-            'username': job.author.username
-        }
-    })
+    job = db.session.execute(
+        JOB_DETAIL.select().join(User, User.id == Job.author_id).where(Job.id == id)
+    ).first()
+    if job is None:
+        abort(404)
+    return jsonify(JOB_DETAIL.dump(job))
 
 @bp.route('/jobs/<int:id>/apply', methods=['POST'])
 @login_required
+@rate_limit('write', by_user)
 def apply_job(id):
-    job = Job.query.get_or_404(id)
-    
-    existing_application = JobApplication.query.filter_by(
-        job_id=job.id,
-        applicant_id=current_user.id
-    ).first()
-    
-    if existing_application:
-        return jsonify({'error': 'You have already applied for this job'}), 400
-        
-    data = request.get_json()
+    # The author's contact columns come with the job, for the email below
+    job = db.session.scalar(
+        select(Job)
+        .options(joinedload(Job.author, innerjoin=True)
+                 .load_only(User.email, User.first_name, User.username))
+        .where(Job.id == id)
+    )
+    if job is None:
+        abort(404)
+    data = request.get_json() or {}
     
     application = JobApplication(
         job_id=job.id,
@@ -94,16 +182,72 @@ def apply_job(id):
         cover_letter=data.get('cover_letter')
     )
     
+    # uq_job_application_job_applicant rejects a second application, so
+    # there's no racy "already applied?" read before the insert
     db.session.add(application)
-    db.session.commit()
+    mail_queue.application_received(job, job.author, current_user)
+    try:
+        increment('job.applicant_count', job.id)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'You have already applied for this job'}), 400
+    invalidate('jobs', f'job:{job.id}')
+    notifier.application_received(job, application)
     
     return jsonify({
         'message': 'Application submitted successfully',
         'id': application.id
     }), 201
 
+EXPORT_COLUMNS = (
+    'id', 'job_id', 'applicant_id', 'applicant_username', 'status',
+    'resume', 'cover_letter', 'created_at'
+)
+
+def _export_rows(job_id, status):
+    # Plain rows streamed in chunks (a server-side cursor where the driver
+    # supports one), so memory stays flat however many applicants there are
+    stmt = select(
+        JobApplication.id, JobApplication.job_id, JobApplication.applicant_id,
+        User.username.label('applicant_username'), JobApplication.status,
+        JobApplication.resume, JobApplication.cover_letter, JobApplication.created_at
+    ).join(User, User.id == JobApplication.applicant_id)\
+        .where(JobApplication.job_id == job_id)\
+        .order_by(JobApplication.id)
+    if status:
+        stmt = stmt.where(JobApplication.status == status)
+    chunk_size = current_app.config['APPLICATION_EXPORT_CHUNK_SIZE']
+    return db.session.execute(stmt.execution_options(yield_per=chunk_size))
+
+def _export_record(row):
+    record = row._asdict()
+    record['created_at'] = row.created_at.isoformat() if row.created_at else None
+    return record
+
+def _stream_ndjson(rows):
+    dumps = current_app.json.dumps
+    for row in rows:
+        yield dumps(row._asdict()) + '\n'
+
+def _stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(_export_record(row))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', _stream_ndjson),
+    'csv': ('text/csv', _stream_csv),
+}
+
 @bp.route('/jobs/<int:id>/applications', methods=['GET'])
 @login_required
+@query_budget(2)
 def get_job_applications(id):
     job = Job.query.get_or_404(id)
     
@@ -111,16 +255,119 @@ def get_job_applications(id):
     if job.author_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    applications = JobApplication.query.filter_by(job_id=id).all()
+    status = request.args.get('status')
+    if status and status not in APPLICATION_STATUSES:
+        return jsonify({'error': 'Invalid status'}), 400
+    
+    export_format = request.args.get('format', 'json')
+    if export_format in EXPORT_FORMATS:
+        mimetype, stream = EXPORT_FORMATS[export_format]
+        response = Response(stream_with_context(stream(_export_rows(id, status))),
+                            mimetype=mimetype)
+        response.headers['Content-Disposition'] = \
+            f'attachment; filename=job-{id}-applications.{export_format}'
+        return response
+    if export_format != 'json':
+        return jsonify({'error': 'Unsupported format'}), 400
+    
+    applications = APPLICATION.select()\
+        .join(User, User.id == JobApplication.applicant_id)\
+        .where(JobApplication.job_id == id)\
+        .order_by(JobApplication.id)
+    if status:
+        applications = applications.where(JobApplication.status == status)
+    
+    return jsonify({
+        'applications': APPLICATION.dump_many(db.session.execute(applications))
+    })
+
+@bp.route('/jobs/<int:id>/applications', methods=['PATCH'])
+@login_required
+@rate_limit('write', by_user)
+@query_budget(2)
+def update_application_statuses(id):
+    author_id = db.session.scalar(select(Job.author_id).where(Job.id == id))
+    if author_id is None:
+        abort(404)
+    
+    # Only job author can change application statuses
+    if author_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    status = data.get('status')
+    if status not in APPLICATION_STATUSES:
+        return jsonify({'error': 'Invalid status'}), 400
+    
+    # Applications are picked by id, by filter, or both; one is required so
+    # a bare status can't rewrite every application
+    ids, criteria = data.get('ids'), data.get('filter')
+    if ids is None and criteria is None:
+        return jsonify({'error': 'Provide ids or a filter'}), 400
+    conditions = [JobApplication.job_id == id, JobApplication.status != status]
+    if ids is not None:
+        if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+            return jsonify({'error': 'ids must be a list of integers'}), 400
+        if len(ids) > current_app.config['APPLICATION_STATUS_MAX_IDS']:
+            return jsonify({'error': 'Too many ids in one request'}), 400
+        conditions.append(JobApplication.id.in_(ids))
+    if criteria is not None:
+        if not isinstance(criteria, dict) or criteria.keys() - {'status'}:
+            return jsonify({'error': 'Unsupported filter'}), 400
+        if 'status' in criteria:
+            if criteria['status'] not in APPLICATION_STATUSES:
+                return jsonify({'error': 'Invalid status'}), 400
+            conditions.append(JobApplication.status == criteria['status'])
+    
+    # One set-based UPDATE; rows already in the target status are left alone
+    updated = db.session.execute(
+        update(JobApplication)
+        .where(*conditions)
+        .values(status=status)
+        .returning(JobApplication.id, JobApplication.applicant_id),
+        execution_options={'synchronize_session': False}
+    ).all()
+    db.session.commit()
+    notifier.application_statuses_changed(id, status, updated)
+    
+    response = {
+        'status': status,
+        'updated': len(updated),
+        'application_ids': sorted(row.id for row in updated)
+    }
+    if ids is not None:
+        # Already in the target status, filtered out, or not on this job
+        response['unchanged'] = len(set(ids)) - len(updated)
+    return jsonify(response)
+
+@bp.route('/jobs/<int:id>/applications/<int:application_id>', methods=['PATCH'])
+@login_required
+@rate_limit('write', by_user)
+def update_application_status(id, application_id):
+    application = JobApplication.query\
+        .join(Job, Job.id == JobApplication.job_id)\
+        .filter(JobApplication.id == application_id, JobApplication.job_id == id)\
+        .add_columns(Job.author_id)\
+        .first()
+    if application is None:
+        return jsonify({'error': 'Application not found'}), 404
+    application, author_id = application
+    
+    # Only job author can change an application's status
+    if author_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    status = (request.get_json(silent=True) or {}).get('status')
+    if status not in APPLICATION_STATUSES:
+        return jsonify({'error': 'Invalid status'}), 400
+    
+    if application.status != status:
+        application.status = status
+        db.session.commit()
+        notifier.application_status_changed(application)
     
     return jsonify({
-        'applications': [{
-            'id': app.id,
-            'job_id': app.job_id,
-            'applicant_id': app.applicant_id,
-            'cover_letter': app.cover_letter,
-            'resume': app.resume,
-            'status': app.status,
-            'created_at': app.created_at.isoformat()
-        } for app in applications]
+        'id': application.id,
+        'job_id': application.job_id,
+        'status': application.status
     })
@@ -0,0 +1,202 @@
+import os
+import uuid
+from datetime import datetime
+from flask import Response, abort, current_app, jsonify, redirect, request, send_file, url_for
+from flask_login import login_required, current_user
+from seagro.api import bp
+from seagro.media import media
+from seagro.media.processing import DERIVED_SUFFIXES
+from seagro.models.media import MediaUpload
+from seagro.ratelimit import by_user, rate_limit
+from sqlalchemy import select
+from seagro import db
+
+MAX_PART_NUMBER = 10000  # as in S3
+
+def _own_upload(id):
+    upload = db.session.get(MediaUpload, id)
+    # Someone else's upload looks the same as a missing one
+    if upload is None or upload.user_id != current_user.id:
+        abort(404)
+    return upload
+
+def _upload_state(upload, parts=None):
+    return {
+        'id': upload.id,
+        'key': upload.key,
+        'kind': upload.kind,
+        'content_type': upload.content_type,
+        'status': upload.status,
+        'size': upload.size,
+        'declared_size': upload.declared_size,
+        'part_size': current_app.config['MEDIA_PART_SIZE'],
+        'parts': parts if parts is not None else []
+    }
+
+def _size_limit(upload):
+    limit = current_app.config['MEDIA_MAX_SIZE']
+    if upload.declared_size is not None:
+        limit = min(limit, upload.declared_size)
+    return limit
+
+@bp.route('/media/uploads', methods=['POST'])
+@login_required
+@rate_limit('write', by_user)
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    content_type = data.get('content_type')
+    extension = current_app.config['MEDIA_CONTENT_TYPES'].get(content_type)
+    if extension is None:
+        return jsonify({'error': 'Unsupported content type'}), 400
+    size = data.get('size')
+    if size is not None and (not isinstance(size, int) or size < 0):
+        return jsonify({'error': 'Invalid size'}), 400
+    if size is not None and size > current_app.config['MEDIA_MAX_SIZE']:
+        return jsonify({'error': 'File too large'}), 413
+
+    kind = content_type.split('/')[0]
+    key = f'{kind}s/{current_user.id}/{uuid.uuid4().hex}{extension}'
+    upload = MediaUpload(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        key=key,
+        kind=kind,
+        content_type=content_type,
+        declared_size=size,
+        storage_upload_id=media.storage.create_upload(key, content_type)
+    )
+    db.session.add(upload)
+    db.session.commit()
+
+    return jsonify(_upload_state(upload)), 201
+
+@bp.route('/media/uploads/<id>', methods=['GET'])
+@login_required
+def get_upload(id):
+    # Lists the parts already stored so an interrupted client can resume
+    upload = _own_upload(id)
+    parts = None
+    if upload.status == 'uploading':
+        parts = media.storage.list_parts(upload.key, upload.storage_upload_id)
+    return jsonify(_upload_state(upload, parts))
+
+@bp.route('/media/uploads/<id>/parts/<int:part_number>', methods=['PUT'])
+@login_required
+@rate_limit('write', by_user)
+def upload_part(id, part_number):
+    if not 1 <= part_number <= MAX_PART_NUMBER:
+        return jsonify({'error': 'Invalid part number'}), 400
+    length = request.content_length
+    if length is None:
+        return jsonify({'error': 'Content-Length required'}), 411
+    if length > current_app.config['MEDIA_MAX_PART_SIZE']:
+        return jsonify({'error': 'Part too large'}), 413
+
+    upload = _own_upload(id)
+    if upload.status != 'uploading':
+        return jsonify({'error': f'Upload is {upload.status}'}), 409
+    # Parts stored so far (less any earlier attempt at this one) plus this
+    # part. Parts sent in parallel can each pass this; complete_upload checks
+    # the final total again.
+    stored = sum(part['size'] for part in media.storage.list_parts(upload.key, upload.storage_upload_id)
+                 if part['part_number'] != part_number)
+    if stored + length > _size_limit(upload):
+        return jsonify({'error': 'Upload larger than allowed'}), 413
+    # The body is streamed to storage, never read into memory whole
+    etag = media.storage.upload_part(upload.key, upload.storage_upload_id, part_number,
+                                     request.stream, length)
+
+    return jsonify({'part_number': part_number, 'etag': etag, 'size': length})
+
+@bp.route('/media/uploads/<id>/complete', methods=['POST'])
+@login_required
+@rate_limit('write', by_user)
+def complete_upload(id):
+    upload = _own_upload(id)
+    if upload.status != 'uploading':
+        return jsonify({'error': f'Upload is {upload.status}'}), 409
+
+    stored = media.storage.list_parts(upload.key, upload.storage_upload_id)
+    requested = (request.get_json(silent=True) or {}).get('parts')
+    if requested is None:
+        # Everything uploaded so far, in order
+        parts = stored
+    else:
+        if not isinstance(requested, list) or not all(
+                isinstance(part, dict) and isinstance(part.get('part_number'), int)
+                and isinstance(part.get('etag'), str) for part in requested):
+            return jsonify({'error': 'Invalid part list'}), 400
+        numbers = [part['part_number'] for part in requested]
+        if numbers != sorted(set(numbers)):
+            return jsonify({'error': 'Parts must be in ascending order without repeats'}), 400
+        parts = requested
+    if not parts:
+        return jsonify({'error': 'No parts uploaded'}), 400
+    sizes = {part['part_number']: part['size'] for part in stored}
+    if sum(sizes.get(part['part_number'], 0) for part in parts) > _size_limit(upload):
+        return jsonify({'error': 'Upload larger than allowed'}), 413
+
+    upload.size = media.storage.complete_upload(upload.key, upload.storage_upload_id, parts)
+    upload.status = 'complete'
+    upload.completed_at = datetime.utcnow()
+    db.session.commit()
+    media.process(upload.key, upload.kind, upload.content_type)
+
+    state = _upload_state(upload)
+    state['url'] = url_for('api.get_media', key=upload.key)
+    state['download_url'] = media.url(upload.key)
+    return jsonify(state)
+
+@bp.route('/media/uploads/<id>', methods=['DELETE'])
+@login_required
+@rate_limit('write', by_user)
+def abort_upload(id):
+    upload = _own_upload(id)
+    if upload.status != 'uploading':
+        return jsonify({'error': f'Upload is {upload.status}'}), 409
+    media.storage.abort_upload(upload.key, upload.storage_upload_id)
+    upload.status = 'aborted'
+    db.session.commit()
+
+    return jsonify({'message': 'Upload aborted'})
+
+def _upload_key(key):
+    for suffix in DERIVED_SUFFIXES:
+        if key.endswith(suffix):
+            return key[:-len(suffix)]
+    return key
+
+@bp.route('/media/files/<path:key>', methods=['GET'])
+def get_media(key):
+    # A stable URL for posts to store; each visit is sent on to a fresh
+    # signed URL, so the bytes never pass through this worker. Only finished
+    # uploads (and files derived from them) are ever signed.
+    complete = db.session.scalar(
+        select(MediaUpload.id)
+        .where(MediaUpload.key == _upload_key(key), MediaUpload.status == 'complete')
+    )
+    if complete is None:
+        abort(404)
+    response = redirect(media.url(key))
+    response.cache_control.private = True
+    response.cache_control.max_age = max(current_app.config['MEDIA_URL_EXPIRES'] - 60, 0)
+    return response
+
+@bp.route('/media/signed/<path:key>', methods=['GET'])
+def serve_media(key):
+    # Target of local-storage signed URLs when MEDIA_URL is unset
+    if current_app.config['MEDIA_STORAGE'] != 'local':
+        abort(404)
+    if not media.verify(key, request.args.get('expires'), request.args.get('signature')):
+        abort(403)
+    accel = current_app.config['MEDIA_ACCEL_REDIRECT']
+    if accel:
+        # The front-end server sends the file from its internal location
+        response = Response(status=200)
+        response.headers['X-Accel-Redirect'] = f"{accel.rstrip('/')}/{key}"
+        return response
+    # Development only: Flask sends the file itself
+    path = media.storage.path(key)
+    if not os.path.isfile(path):
+        abort(404)
+    return send_file(path, conditional=True)
@@ -0,0 +1,30 @@
+import base64
+import json
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(*keys):
+    """Opaque token for the sort key (e.g. created_at, id) of a page's last row."""
+    values = [key.isoformat() if isinstance(key, datetime) else key for key in keys]
+    raw = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _parse(kind, value):
+    return datetime.fromisoformat(value) if kind is datetime else kind(value)
+
+
+def decode_cursor(token, *kinds):
+    """The keys of an ``encode_cursor`` token, each parsed as ``kinds`` says."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(kinds):
+            raise ValueError(token)
+        return tuple(_parse(kind, value) for kind, value in zip(kinds, values))
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
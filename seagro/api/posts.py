@@ -0,0 +1,143 @@
+from flask import abort, jsonify, request
+from flask_login import login_required, current_user
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from seagro.api import bp
+from seagro.api.pagination import InvalidCursor, decode_cursor, encode_cursor
+from seagro.counters import increment
+from seagro.models.post import Follow, Post
+from seagro.models.user import User
+from seagro.ratelimit import by_user, rate_limit
+from seagro.serializers import POST
+from seagro.timelines import timelines
+from seagro import db, cache
+
+def _post_key(id):
+    return f'post:{id}'
+
+def _load_posts(ids):
+    # Posts aren't edited, so each is cached as its serialized dict (the
+    # author's name may lag until the entry expires); a warm feed page is a
+    # single get_many
+    cached = dict(zip(ids, cache.get_many(*(_post_key(id) for id in ids)))) if ids else {}
+    missing = [id for id, post in cached.items() if post is None]
+    if missing:
+        rows = db.session.execute(
+            POST.select()
+            .join(User, User.id == Post.user_id)
+            .where(Post.id.in_(missing))
+        )
+        loaded = {post['id']: post for post in POST.dump_many(rows)}
+        cache.set_many({_post_key(id): post for id, post in loaded.items()})
+        cached.update(loaded)
+    return [cached[id] for id in ids if cached.get(id) is not None]
+
+def _page_args():
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    token = request.args.get('cursor')
+    before = decode_cursor(token, int)[0] if token else None
+    return before, per_page
+
+def _page(post_ids, per_page):
+    has_more = len(post_ids) > per_page
+    post_ids = post_ids[:per_page]
+    return jsonify({
+        'posts': _load_posts(post_ids),
+        'next_cursor': encode_cursor(post_ids[-1]) if has_more else None
+    })
+
+def _optional_url(data, field):
+    value = data.get(field)
+    return value is None or (isinstance(value, str) and len(value) <= 256)
+
+@bp.route('/posts', methods=['POST'])
+@login_required
+@rate_limit('write', by_user)
+def create_post():
+    data = request.get_json(silent=True) or {}
+    content = data.get('content')
+    if not isinstance(content, str) or not content.strip():
+        return jsonify({'error': 'Missing content'}), 400
+    if not _optional_url(data, 'image_url') or not _optional_url(data, 'video_url'):
+        return jsonify({'error': 'Invalid media URL'}), 400
+
+    post = Post(
+        content=content,
+        image_url=data.get('image_url'),
+        video_url=data.get('video_url'),
+        user_id=current_user.id
+    )
+    db.session.add(post)
+    db.session.commit()
+    timelines.fan_out(post)
+
+    data = POST.dump_object(post)
+    cache.set(_post_key(post.id), data)
+    return jsonify(data), 201
+
+@bp.route('/posts/<int:id>', methods=['GET'])
+def get_post(id):
+    posts = _load_posts([id])
+    if not posts:
+        abort(404)
+    return jsonify(posts[0])
+
+@bp.route('/users/<int:id>/posts', methods=['GET'])
+def get_user_posts(id):
+    try:
+        before, per_page = _page_args()
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    query = select(Post.id).where(Post.user_id == id)
+    if before is not None:
+        query = query.where(Post.id < before)
+    post_ids = list(db.session.scalars(query.order_by(Post.id.desc()).limit(per_page + 1)))
+    return _page(post_ids, per_page)
+
+@bp.route('/feed', methods=['GET'])
+@login_required
+def get_feed():
+    try:
+        before, per_page = _page_args()
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    return _page(timelines.page(current_user.id, before, per_page), per_page)
+
+@bp.route('/users/<int:id>/follow', methods=['POST'])
+@login_required
+@rate_limit('write', by_user)
+def follow_user(id):
+    if id == current_user.id:
+        return jsonify({'error': 'You cannot follow yourself'}), 400
+    if db.session.scalar(select(User.id).where(User.id == id)) is None:
+        abort(404)
+
+    # uq_follow_follower_followed rejects a second follow
+    db.session.add(Follow(follower_id=current_user.id, followed_id=id))
+    try:
+        increment('user.follower_count', id)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Already following'}), 400
+    timelines.following_changed(current_user.id)
+
+    return jsonify({'message': 'Followed'})
+
+@bp.route('/users/<int:id>/follow', methods=['DELETE'])
+@login_required
+@rate_limit('write', by_user)
+def unfollow_user(id):
+    result = db.session.execute(
+        delete(Follow).where(Follow.follower_id == current_user.id, Follow.followed_id == id)
+    )
+    if not result.rowcount:
+        db.session.rollback()
+        return jsonify({'error': 'Not following'}), 404
+    increment('user.follower_count', id, -1)
+    db.session.commit()
+    timelines.following_changed(current_user.id)
+
+    return jsonify({'message': 'Unfollowed'})
@@ -1,71 +0,0 @@
-from flask import Blueprint, jsonify, request
-from flask_login import login_user, logout_user, login_required, current_user
-from seagro.models.user import User
-from seagro import db
-import logging
-import traceback
-
-bp = Blueprint('auth', __name__)
-logger = logging.getLogger(__name__)
-
-@bp.route('/login', methods=['POST'])
-def login():
-    try:
-        data = request.get_json()
-        
-        if not data or not data.get('email') or not data.get('password'):
-            return jsonify({'message': 'Missing required fields'}), 400
-        
-        user = User.query.filter_by(email=data.get('email')).first()
-        
-        if not user or not user.check_password(data.get('password')):
-            return jsonify({'message': 'Invalid email or password'}), 401
-        
-        # Login the user using Flask-Login
-        login_user(user)
-        
-        return jsonify({
-            'message': 'Logged in successfully',
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email
-            }
-        }), 200
-            
-    except Exception as e:
-        logger.error(f"Login error: {str(e)}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        return jsonify({'message': 'Login failed', 'error': str(e)}), 500
-
-@bp.route('/register', methods=['POST'])
-def register():
-    data = request.get_json()
-    
-    if not data or not data.get('email') or not data.get('password') or not data.get('username'):
-        return jsonify({'message': 'Missing required fields'}), 400
-    
-    if User.query.filter_by(email=data.get('email')).first():
-        return jsonify({'message': 'Email already registered'}), 400
-    
-    if User.query.filter_by(username=data.get('username')).first():
-        return jsonify({'message': 'Username already taken'}), 400
-    
-    user = User(
-        username=data.get('username'),
-        email=data.get('email'),
-        first_name=data.get('first_name'),
-        last_name=data.get('last_name')
-    )
-    user.set_password(data.get('password'))
-    
-    db.session.add(user)
-    db.session.commit()
-    
-    return jsonify({'message': 'User registered successfully'}), 201
-
-@bp.route('/logout')
-@login_required
-def logout():
-    logout_user()
-    return jsonify({'message': 'Logged out successfully'}), 200
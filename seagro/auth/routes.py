@@ -1,59 +1,120 @@
-from flask import jsonify, request
+from flask import g, jsonify, request
 from flask_login import login_user, logout_user, login_required
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
 from seagro.auth import bp
+from seagro.mailqueue import mail_queue
 from seagro.models.user import User
+from seagro.ratelimit import by_account, by_ip, rate_limit
+from seagro.serializers import USER_ACCOUNT
+from seagro.tokens import TokenError, decode, issue_tokens, refresh_tokens, revoke
 from seagro import db
 
+def _error(message, status):
+    # Clients of the old auth module read 'message', newer ones 'error'
+    return jsonify({'error': message, 'message': message}), status
+
+def _missing(data, *fields):
+    return not isinstance(data, dict) or \
+        not all(isinstance(data.get(f), str) and data.get(f) for f in fields)
+
 @bp.route('/login', methods=['POST'])
+@rate_limit('login', by_ip, by_account)
 def login():
-    data = request.get_json()
-    if not data:
-        return jsonify({'error': 'No input data provided'}), 400
-        
-    user = User.query.filter_by(email=data.get('email')).first()
-    if user is None or not user.check_password(data.get('password')):
-        return jsonify({'error': 'Invalid email or password'}), 401
+    data = request.get_json(silent=True)
+    if _missing(data, 'email', 'password'):
+        return _error('Missing required fields', 400)
+    
+    # One lookup on the unique email index
+    user = User.query.filter_by(email=data['email']).first()
+    if user is None or not user.check_password(data['password']):
+        return _error('Invalid email or password', 401)
+    
+    # Upgrade hashes made with an older cost now that we know the password
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        db.session.commit()
         
-    login_user(user)
+    # Flask-Login refuses inactive accounts; so must the bearer tokens
+    if not login_user(user):
+        return _error('Account is disabled', 403)
     return jsonify({
         'message': 'Logged in successfully',
-        'user': {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email
-        }
+        'user': USER_ACCOUNT.dump_object(user),
+        **issue_tokens(user)
     })
 
-@bp.route('/logout')
+@bp.route('/refresh', methods=['POST'])
+@rate_limit('refresh', by_ip)
+def refresh():
+    data = request.get_json(silent=True) or {}
+    token = data.get('refresh_token')
+    if not isinstance(token, str):
+        return _error('Missing refresh token', 400)
+    try:
+        return jsonify(refresh_tokens(token))
+    except TokenError as exc:
+        return _error(str(exc), 401)
+
+@bp.route('/logout', methods=['GET', 'POST'])
 @login_required
 def logout():
+    # Bearer clients revoke the token they used and, if sent, its refresh token
+    if 'access_token' in g:
+        revoke(g.access_token)
+    token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if isinstance(token, str):
+        try:
+            revoke(decode(token, 'refresh'))
+        except TokenError:
+            pass
     logout_user()
     return jsonify({'message': 'Logged out successfully'})
 
+def _conflict(email, username):
+    taken = db.session.execute(
+        select(User.email, User.username)
+        .where(or_(User.email == email, User.username == username))
+        .limit(2)
+    ).all()
+    if any(row.email == email for row in taken):
+        return 'Email already registered'
+    if taken:
+        return 'Username already taken'
+    return None
+
 @bp.route('/register', methods=['POST'])
+@rate_limit('register', by_ip)
 def register():
-    data = request.get_json()
-    if not data:
-        return jsonify({'error': 'No input data provided'}), 400
-        
-    if User.query.filter_by(email=data.get('email')).first():
-        return jsonify({'error': 'Email already registered'}), 400
-        
-    if User.query.filter_by(username=data.get('username')).first():
-        return jsonify({'error': 'Username already taken'}), 400
-        
+    data = request.get_json(silent=True)
+    if _missing(data, 'email', 'password', 'username'):
+        return _error('Missing required fields', 400)
+    
+    # Both uniqueness checks in one query, before spending time on the hash
+    conflict = _conflict(data['email'], data['username'])
+    if conflict:
+        return _error(conflict, 400)
+    
     user = User(
-        username=data.get('username'),
-        email=data.get('email'),
+        username=data['username'],
+        email=data['email'],
         first_name=data.get('first_name'),
         last_name=data.get('last_name')
     )
-    user.set_password(data.get('password'))
+    user.set_password(data['password'])
     
     db.session.add(user)
-    db.session.commit()
+    mail_queue.registration_confirmation(user)
+    try:
+        db.session.flush()
+        user_id = user.id  # read before the commit expires it
+        db.session.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent registration; the unique indexes held
+        db.session.rollback()
+        return _error(_conflict(data['email'], data['username']) or 'Registration failed', 400)
     
     return jsonify({
         'message': 'User registered successfully',
-        'user_id': user.id
+        'user_id': user_id
     }), 201
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import time
+from functools import wraps
+
+from flask import current_app, request
+
+from seagro import cache, db
+from seagro.database import use_primary
+
+
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def _tag_versions(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(*keys)
+    for i, (key, version) in enumerate(zip(keys, versions)):
+        if version is None:
+            # add() only wins if nobody else created the version meanwhile
+            cache.add(key, time.time_ns(), timeout=0)
+            versions[i] = cache.get(key)
+    return versions
+
+
+def invalidate(*tags):
+    """Orphan every cached response carrying one of ``tags``.
+
+    Call this after the write that changes the data has committed.
+    """
+    for tag in tags:
+        cache.set(_tag_key(tag), time.time_ns(), timeout=0)
+
+
+def cached_response(*tags, timeout=None):
+    """Cache a view's successful response, keyed on its arguments.
+
+    ``tags`` may reference view arguments, e.g. ``'job:{id}'``. The cached
+    body carries an ETag so clients revalidating with If-None-Match get a
+    304 without the body being sent again.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['RESPONSE_CACHE_ENABLED']:
+                return f(*args, **kwargs)
+
+            resolved = [tag.format(**kwargs) for tag in tags]
+            signature = json.dumps([
+                sorted(kwargs.items()),
+                sorted(request.args.items(multi=True)),
+                _tag_versions(resolved)
+            ], default=str)
+            key = 'view:%s:%s' % (request.endpoint,
+                                  hashlib.sha1(signature.encode()).hexdigest())
+
+            entry = cache.get(key)
+            hit = entry is not None
+            if not hit:
+                # Stored under the current tag versions, so it must not come
+                # from a replica that hasn't seen the write behind them yet
+                with use_primary(db.session):
+                    response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                entry = (body, response.mimetype, hashlib.sha1(body).hexdigest())
+                cache.set(key, entry, timeout=timeout)
+
+            body, mimetype, etag = entry
+            response = current_app.response_class(body, mimetype=mimetype)
+            response.set_etag(etag)
+            response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
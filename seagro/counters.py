@@ -0,0 +1,44 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, update
+
+from seagro import db
+from seagro.models.course import Course, CourseEnrollment
+from seagro.models.job import Job, JobApplication
+from seagro.models.post import Follow
+from seagro.models.user import User
+
+# counter column -> (owning table's key, child rows' foreign key)
+COUNTERS = {
+    'job.applicant_count': (Job.applicant_count, Job.id, JobApplication.job_id),
+    'course.enrollment_count': (Course.enrollment_count, Course.id, CourseEnrollment.course_id),
+    'user.follower_count': (User.follower_count, User.id, Follow.followed_id),
+}
+
+
+def increment(counter, id, amount=1):
+    """Bump ``counter`` for one row inside the caller's transaction."""
+    column, key, _ = COUNTERS[counter]
+    db.session.execute(
+        update(column.class_).where(key == id).values({column: column + amount})
+    )
+
+
+def reconcile(counter):
+    """Recount ``counter`` from the child rows; returns the rows repaired."""
+    column, key, foreign_key = COUNTERS[counter]
+    actual = select(func.count()).where(foreign_key == key).scalar_subquery()
+    result = db.session.execute(
+        update(column.class_).where(column != actual).values({column: actual}),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+@click.command('reconcile-counters')
+@with_appcontext
+def reconcile_counters():
+    """Recompute denormalized counters that have drifted."""
+    for counter in COUNTERS:
+        click.echo(f'{counter}: repaired {reconcile(counter)} rows')
@@ -0,0 +1,245 @@
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),      # readers no longer block the writer
+    ('synchronous', 'NORMAL'),    # durable at checkpoints, safe with WAL
+    ('cache_size', -20000),       # ~20 MB page cache per connection
+    ('temp_store', 'MEMORY'),
+    ('mmap_size', 268435456),
+)
+
+
+def _sqlite_wal_profile(config):
+    return {'connect_args': {'timeout': config['DB_POOL_TIMEOUT']}}
+
+
+def _postgres_profile(config):
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+        'pool_use_lifo': True,  # lets idle connections past pool_size age out
+    }
+    if config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {
+            'options': '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT_MS']
+        }
+    return options
+
+
+ENGINE_PROFILES = {
+    'default': lambda config: {},
+    'sqlite-wal': _sqlite_wal_profile,
+    'postgres': _postgres_profile,
+}
+
+
+def _resolve_profile(config, url):
+    profile = config['DB_PROFILE']
+    if profile == 'auto':
+        backend = make_url(url).get_backend_name()
+        profile = {'sqlite': 'sqlite-wal', 'postgresql': 'postgres'}.get(backend, 'default')
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f'Unknown DB_PROFILE {profile!r}')
+    return profile
+
+
+def configure_engines(app):
+    """Fill in engine options from ``DB_PROFILE`` before ``db.init_app``.
+
+    Explicit ``SQLALCHEMY_ENGINE_OPTIONS`` still win over the profile. The
+    ``DB_*`` defaults live in ``config.Config``.
+    """
+    config = app.config
+    url = config['SQLALCHEMY_DATABASE_URI']
+    profile = _resolve_profile(config, url)
+    config['DB_ENGINE_PROFILE'] = profile
+    options = ENGINE_PROFILES[profile](config)
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def _sqlite_pragmas(config):
+    # Wait for the write lock as long as for a pool connection, instead of failing
+    pragmas = SQLITE_PRAGMAS + (('busy_timeout', int(config['DB_POOL_TIMEOUT'] * 1000)),)
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+    return set_pragmas
+
+
+def install_engine_hooks(app, db):
+    """Attach per-connection setup, the read replica and pool metrics.
+
+    The replica engine (``DATABASE_REPLICA_URL``) gets its own profile and is
+    kept outside ``SQLALCHEMY_BINDS`` so create_all/drop_all never touch it.
+    """
+    with app.app_context():
+        engines = dict(db.engines)
+
+    replica_url = app.config['DATABASE_REPLICA_URL']
+    if replica_url:
+        profile = _resolve_profile(app.config, replica_url)
+        replica = create_engine(replica_url, **ENGINE_PROFILES[profile](app.config))
+        app.extensions['db_replica'] = replica
+        engines['replica'] = replica
+
+    set_pragmas = _sqlite_pragmas(app.config)
+    for engine in engines.values():
+        if engine.dialect.name == 'sqlite' and app.config['DB_ENGINE_PROFILE'] == 'sqlite-wal':
+            event.listen(engine, 'connect', set_pragmas)
+
+    from seagro.metrics import Counter, Gauge, metrics
+    registry = metrics.registry(app)
+    if registry is None:
+        return
+
+    checkouts = registry.register(Counter(
+        'seagro_db_pool_checkouts_total', 'Connections checked out of the pool.', ('bind',)))
+    for key, engine in engines.items():
+        label = (key or 'default',)
+        event.listen(engine.pool, 'checkout',
+                     lambda *args, label=label: checkouts.inc(label))
+
+    def pool_stat(method):
+        def collect():
+            for key, engine in engines.items():
+                stat = getattr(engine.pool, method, None)
+                if stat is not None:
+                    yield (key or 'default',), stat()
+        return collect
+
+    registry.register(Gauge('seagro_db_pool_size', 'Configured pool size.',
+                            ('bind',), pool_stat('size')))
+    registry.register(Gauge('seagro_db_pool_checked_out', 'Connections currently in use.',
+                            ('bind',), pool_stat('checkedout')))
+    registry.register(Gauge('seagro_db_pool_overflow', 'Connections open beyond pool_size.',
+                            ('bind',), pool_stat('overflow')))
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+_REVISION_RE = re.compile(r"^(revision|down_revision)\s*=\s*(.+)$", re.MULTILINE)
+_ID_RE = re.compile(r"['\"](\w+)['\"]")
+
+# (database url, migrations directory) -> revision found at the last check
+_schema_checks = {}
+_schema_lock = threading.Lock()
+
+
+def migration_heads(directory):
+    """Head revisions of the Alembic scripts in ``directory``.
+
+    Read straight from the version files so the check needs neither Alembic
+    nor an import of each migration module.
+    """
+    revisions, parents = set(), set()
+    versions = os.path.join(directory, 'versions')
+    for name in os.listdir(versions):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(versions, name)) as f:
+            for key, value in _REVISION_RE.findall(f.read()):
+                ids = _ID_RE.findall(value)
+                (revisions if key == 'revision' else parents).update(ids)
+    return revisions - parents
+
+
+def database_revision(engine):
+    with engine.connect() as connection:
+        try:
+            return connection.execute(text('SELECT version_num FROM alembic_version')).scalar()
+        except (OperationalError, ProgrammingError):
+            return None
+
+
+def migrations_dir(app):
+    """``MIGRATIONS_DIR``, with a relative path taken from ``app.root_path``."""
+    return os.path.join(app.root_path, app.config['MIGRATIONS_DIR'])
+
+
+def check_schema(app, db):
+    """Compare the database's Alembic revision with the migration head.
+
+    Replaces ``create_all`` at boot: the schema is owned by ``flask db
+    upgrade``. ``SCHEMA_CHECK`` is 'warn' (log), 'error' (raise
+    SchemaOutOfDate) or 'off'. The answer is cached per process, so app
+    factories called again (workers, tests) skip the round trip.
+    """
+    mode = app.config['SCHEMA_CHECK']
+    if mode == 'off':
+        return None
+    directory = migrations_dir(app)
+    key = (app.config['SQLALCHEMY_DATABASE_URI'], directory)
+    with _schema_lock:
+        if key not in _schema_checks:
+            with app.app_context():
+                current = database_revision(db.engine)
+            heads = migration_heads(directory)
+            _schema_checks[key] = (current, heads)
+        current, heads = _schema_checks[key]
+
+    if current not in heads:
+        message = (f'Database schema is at revision {current or "<none>"}, migrations are '
+                   f'at {", ".join(sorted(heads))}; run "flask db upgrade"')
+        if mode == 'error':
+            raise SchemaOutOfDate(message)
+        logger.warning(message)
+    return current
+
+
+class RoutingSession(Session):
+    """Send SELECTs made while serving GET/HEAD requests to the replica.
+
+    Flushes, any other statement (DML, DDL, raw SQL) and everything after it
+    in the same session keep using the primary, as does anything run with
+    ``session.info['use_primary']`` set (see ``use_primary``).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or self._flushing or self.info.get('use_primary'):
+            return engine
+        if clause is not None and not getattr(clause, 'is_select', False):
+            # A write in a GET request; later reads must see it
+            self.info['use_primary'] = True
+            return engine
+        if not has_request_context() or request.method not in READ_METHODS:
+            return engine
+        replica = current_app.extensions.get('db_replica')
+        if replica is not None and engine is self._db.engines.get(None):
+            return replica
+        return engine
+
+
+@contextmanager
+def use_primary(session):
+    """Read from the primary inside the block, e.g. for results that get cached."""
+    pinned = session.info.get('use_primary')
+    session.info['use_primary'] = True
+    try:
+        yield session
+    finally:
+        if not pinned:
+            session.info.pop('use_primary', None)
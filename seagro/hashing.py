@@ -0,0 +1,129 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from flask import current_app, jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full and a request must back off."""
+
+
+class HasherTimeout(HasherBusy):
+    """Raised when a hash took longer than ``PASSWORD_HASH_TIMEOUT``."""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+class _HasherState:
+    def __init__(self, config):
+        self.method = config['PASSWORD_HASH_METHOD']
+        self.kind = config['PASSWORD_HASH_EXECUTOR']
+        self.workers = config['PASSWORD_HASH_WORKERS'] or os.cpu_count() or 1
+        self.timeout = config['PASSWORD_HASH_TIMEOUT']
+        # Bound the work in flight (running + queued) so a login burst is
+        # refused quickly instead of piling up behind the pool.
+        self.slots = threading.BoundedSemaphore(
+            config['PASSWORD_HASH_QUEUE_SIZE'] or self.workers * 4
+        )
+        self.lock = threading.Lock()
+        self.executor = None
+        self.prefix = None
+
+    def get_executor(self):
+        # Created lazily so importing the app never forks worker processes
+        if self.executor is None:
+            with self.lock:
+                if self.executor is None:
+                    if self.kind == 'process':
+                        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self.executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                           thread_name_prefix='pwhash')
+                    atexit.register(self.executor.shutdown, wait=False)
+        return self.executor
+
+
+class PasswordHasher:
+    """Runs password hashing off the request thread.
+
+    ``PASSWORD_HASH_EXECUTOR`` selects ``'process'`` (default), ``'thread'``
+    or ``'inline'`` (hash on the calling thread, handy for tests).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_HASH_EXECUTOR', 'process')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', None)
+        app.config.setdefault('PASSWORD_HASH_QUEUE_SIZE', None)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+        app.extensions['password_hasher'] = _HasherState(app.config)
+        app.register_error_handler(HasherBusy, _hasher_busy)
+        app.register_error_handler(HasherTimeout, _hasher_timeout)
+
+    @property
+    def _state(self):
+        return current_app.extensions['password_hasher']
+
+    def _run(self, fn, *args):
+        state = self._state
+        if state.kind == 'inline':
+            return fn(*args)
+        if not state.slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = state.get_executor().submit(fn, *args)
+        except BaseException:
+            state.slots.release()
+            raise
+        future.add_done_callback(lambda f: state.slots.release())
+        try:
+            return future.result(timeout=state.timeout)
+        except FutureTimeout:
+            # Drop it if it hasn't started; a running hash keeps its slot
+            future.cancel()
+            raise HasherTimeout()
+
+    def hash(self, password):
+        return self._run(_hash, password, self._state.method)
+
+    def verify(self, pwhash, password):
+        return self._run(_verify, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        state = self._state
+        if state.prefix is None:
+            # Werkzeug expands defaults into the stored prefix, e.g. 'scrypt'
+            # becomes 'scrypt:32768:8:1', so learn it from one sample hash.
+            state.prefix = self.hash('').split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != state.prefix
+
+
+def _hasher_busy(error):
+    response = jsonify({'error': 'Too many requests, please retry shortly'})
+    response.status_code = 429
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def _hasher_timeout(error):
+    response = jsonify({'error': 'Service busy, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
+
+password_hasher = PasswordHasher()
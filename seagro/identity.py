@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from seagro import cache
+
+
+class LRUCache:
+    """Small thread-safe LRU whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class UserCache:
+    """Two-tier cache of user identity rows keyed by user id.
+
+    Reads hit a process-local LRU first, then the shared ``cache`` backend.
+    Entries in other processes' LRUs can outlive an invalidation by at most
+    ``USER_CACHE_TTL`` seconds, so keep that short.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_CACHE_SIZE', 10000)
+        app.config.setdefault('USER_CACHE_TTL', 60)
+        app.extensions['user_cache'] = LRUCache(
+            app.config['USER_CACHE_SIZE'],
+            app.config['USER_CACHE_TTL']
+        )
+
+    @property
+    def _local(self):
+        return current_app.extensions['user_cache']
+
+    @staticmethod
+    def _key(user_id):
+        return f'user:{user_id}'
+
+    def get(self, user_id):
+        data = self._local.get(user_id)
+        if data is None:
+            data = cache.get(self._key(user_id))
+            if data is not None:
+                self._local.set(user_id, data)
+        return data
+
+    def set(self, user_id, data):
+        self._local.set(user_id, data)
+        cache.set(self._key(user_id), data, timeout=current_app.config['USER_CACHE_TTL'])
+
+    def invalidate(self, user_id):
+        self._local.delete(user_id)
+        cache.delete(self._key(user_id))
+
+
+user_cache = UserCache()
@@ -0,0 +1,236 @@
+import logging
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, case, event, select, update
+from sqlalchemy.orm import Session
+
+from seagro import db
+from seagro.models.mail import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Errors that only concern one message; anything else fails the whole batch
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                  smtplib.SMTPDataError)
+
+
+def _backoff(config, attempts):
+    delay = config['MAIL_QUEUE_RETRY_BACKOFF'] * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, config['MAIL_QUEUE_MAX_BACKOFF']))
+
+
+# Claimed rows come back as plain rows: they outlive the claim's commit
+# without the ORM refreshing each one
+_CLAIM_COLUMNS = (OutboundEmail.id, OutboundEmail.recipient, OutboundEmail.subject,
+                  OutboundEmail.body, OutboundEmail.html, OutboundEmail.attempts,
+                  OutboundEmail.status)
+
+_table = OutboundEmail.__table__
+_RECORD_RESULT = update(_table)\
+    .where(_table.c.id == bindparam('b_id'))\
+    .values(status=bindparam('b_status'), next_attempt_at=bindparam('b_next_attempt_at'),
+            sent_at=bindparam('b_sent_at'), last_error=bindparam('b_last_error'))
+
+
+def _claim(batch_size, claim_timeout, max_attempts):
+    # One UPDATE ... RETURNING: concurrent workers can't claim the same row,
+    # and rows held by a worker that died come back after claim_timeout.
+    # The attempt is counted here, before sending, so a message that kills
+    # the worker still runs out of attempts; it then comes back as failed.
+    now = datetime.utcnow()
+    exhausted = OutboundEmail.attempts >= max_attempts
+    due = select(OutboundEmail.id)\
+        .where(OutboundEmail.status.in_(('pending', 'sending')),
+               OutboundEmail.next_attempt_at <= now)\
+        .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id)\
+        .limit(batch_size)
+    emails = db.session.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.id.in_(due), OutboundEmail.next_attempt_at <= now)
+        .values(status=case((exhausted, 'failed'), else_='sending'),
+                attempts=case((exhausted, OutboundEmail.attempts),
+                              else_=OutboundEmail.attempts + 1),
+                next_attempt_at=now + claim_timeout)
+        .returning(*_CLAIM_COLUMNS),
+        execution_options={'synchronize_session': False}
+    ).all()
+    db.session.commit()
+    return emails
+
+
+def _send_batch(emails):
+    """Send over one SMTP connection; returns {id: error or None}."""
+    from flask_mail import BadHeaderError, Message
+    from seagro import init_extension
+
+    mail = init_extension('mail')
+    results = {}
+    try:
+        with mail.connect() as connection:
+            for email in emails:
+                message = Message(email.subject, recipients=[email.recipient],
+                                  body=email.body, html=email.html)
+                try:
+                    connection.send(message)
+                except MESSAGE_ERRORS + (BadHeaderError,) as exc:
+                    results[email.id] = exc
+                else:
+                    results[email.id] = None
+    except (OSError, smtplib.SMTPException) as exc:
+        for email in emails:
+            results.setdefault(email.id, exc)
+    return results
+
+
+def deliver(batch_size=None):
+    """Claim one batch of due mail and send it. Returns the number claimed."""
+    config = current_app.config
+    claimed = _claim(batch_size or config['MAIL_QUEUE_BATCH_SIZE'],
+                     timedelta(seconds=config['MAIL_QUEUE_CLAIM_TIMEOUT']),
+                     config['MAIL_QUEUE_MAX_ATTEMPTS'])
+    emails = [email for email in claimed if email.status == 'sending']
+    if not emails:
+        return len(claimed)
+
+    results = _send_batch(emails)
+    now = datetime.utcnow()
+    updates = []
+    for email in emails:
+        error = results[email.id]
+        attempts = email.attempts
+        if error is None:
+            updates.append({'b_id': email.id, 'b_status': 'sent',
+                            'b_next_attempt_at': now, 'b_sent_at': now, 'b_last_error': None})
+            continue
+        last_error = str(error) or type(error).__name__
+        if attempts >= config['MAIL_QUEUE_MAX_ATTEMPTS']:
+            status, next_attempt_at = 'failed', now
+        else:
+            status, next_attempt_at = 'pending', now + _backoff(config, attempts)
+        updates.append({'b_id': email.id, 'b_status': status,
+                        'b_next_attempt_at': next_attempt_at, 'b_sent_at': None,
+                        'b_last_error': last_error})
+        logger.warning('Sending mail %d to %s failed (attempt %d): %s',
+                       email.id, email.recipient, attempts, last_error)
+    db.session.execute(_RECORD_RESULT, updates)
+    db.session.commit()
+    return len(claimed)
+
+
+def drain():
+    batch_size = current_app.config['MAIL_QUEUE_BATCH_SIZE']
+    total = 0
+    while True:
+        claimed = deliver(batch_size)
+        total += claimed
+        if claimed < batch_size:
+            return total
+
+
+class _Worker:
+    def __init__(self, app):
+        self.app = app
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def wake(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='mail-queue', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+
+    def run(self):
+        interval = self.app.config['MAIL_QUEUE_POLL_INTERVAL']
+        while True:
+            self.wakeup.wait(interval)
+            self.wakeup.clear()
+            with self.app.app_context():
+                try:
+                    drain()
+                except Exception:
+                    logger.exception('Mail queue worker failed')
+                finally:
+                    db.session.remove()
+
+
+class MailQueue:
+    """Outbound mail persisted in ``outbound_email`` and sent off-request.
+
+    ``enqueue`` only adds a row to the caller's session, so the mail is sent
+    if and only if that transaction commits. With ``MAIL_QUEUE_THREAD`` a
+    background thread in each process wakes after such commits (and every
+    ``MAIL_QUEUE_POLL_INTERVAL`` seconds); otherwise run ``flask mail-worker``.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MAIL_QUEUE_THREAD', True)
+        app.config.setdefault('MAIL_QUEUE_BATCH_SIZE', 50)
+        app.config.setdefault('MAIL_QUEUE_POLL_INTERVAL', 30)
+        app.config.setdefault('MAIL_QUEUE_MAX_ATTEMPTS', 5)
+        app.config.setdefault('MAIL_QUEUE_RETRY_BACKOFF', 30)
+        app.config.setdefault('MAIL_QUEUE_MAX_BACKOFF', 3600)
+        app.config.setdefault('MAIL_QUEUE_CLAIM_TIMEOUT', 300)
+        app.extensions['mail_queue'] = _Worker(app)
+        app.cli.add_command(mail_worker)
+
+    def enqueue(self, recipient, subject, body, html=None):
+        email = OutboundEmail(recipient=recipient, subject=subject, body=body, html=html)
+        db.session.add(email)
+        db.session.info['mail_queued'] = True
+        return email
+
+    def registration_confirmation(self, user):
+        return self.enqueue(
+            user.email, 'Welcome to Seagro',
+            f'Hi {user.first_name or user.username},\n\n'
+            f'Your Seagro account "{user.username}" has been created.\n'
+        )
+
+    def application_received(self, job, author, applicant):
+        return self.enqueue(
+            author.email, f'New application for {job.title}',
+            f'Hi {author.first_name or author.username},\n\n'
+            f'{applicant.username} applied for {job.title} at {job.company}.\n'
+        )
+
+
+mail_queue = MailQueue()
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker(session):
+    if session.info.pop('mail_queued', False) and has_app_context():
+        if current_app.config['MAIL_QUEUE_THREAD']:
+            current_app.extensions['mail_queue'].wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_wakeup(session):
+    session.info.pop('mail_queued', None)
+
+
+@click.command('mail-worker')
+@click.option('--once', is_flag=True, help='Send what is due and exit.')
+@with_appcontext
+def mail_worker(once):
+    """Send queued mail."""
+    interval = current_app.config['MAIL_QUEUE_POLL_INTERVAL']
+    while True:
+        sent = drain()
+        if once:
+            click.echo(f'Processed {sent} queued emails')
+            return
+        db.session.remove()
+        time.sleep(interval)
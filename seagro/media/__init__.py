@@ -0,0 +1,135 @@
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, jsonify
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from seagro import db
+from seagro.media.processing import process
+from seagro.media.storage import LocalStorage, MediaError, S3Storage, verify
+
+
+class _MediaState:
+    def __init__(self, storage, config):
+        self.storage = storage
+        self.kind = config['MEDIA_PROCESSING_EXECUTOR']
+        self.workers = config['MEDIA_WORKERS']
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def get_executor(self):
+        if self.executor is None:
+            with self.lock:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                       thread_name_prefix='media')
+                    atexit.register(self.executor.shutdown, wait=False)
+        return self.executor
+
+
+class MediaStore:
+    """Uploaded images and videos, in a local directory or an S3 bucket.
+
+    Uploads arrive as numbered parts streamed to the backend, so a client
+    can resume after a dropped connection and no worker ever holds a whole
+    file. Downloads use signed URLs (presigned S3 URLs, or HMAC-signed ones
+    for ``MEDIA_URL``) so the bytes bypass Flask. Completed uploads run the
+    hooks in ``seagro.media.processing.PROCESSORS`` on a thread pool
+    (``MEDIA_PROCESSING_EXECUTOR`` ``'thread'`` or ``'inline'``).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        config.setdefault('MEDIA_STORAGE', 'local')
+        config.setdefault('MEDIA_ROOT', 'media')
+        config.setdefault('MEDIA_URL', None)
+        config.setdefault('MEDIA_ACCEL_REDIRECT', None)
+        config.setdefault('MEDIA_URL_EXPIRES', 3600)
+        config.setdefault('MEDIA_SIGNING_KEY', None)
+        config.setdefault('MEDIA_S3_BUCKET', config.get('AWS_BUCKET_NAME'))
+        config.setdefault('MEDIA_S3_ENDPOINT_URL', None)
+        config.setdefault('MEDIA_S3_REGION', None)
+        config.setdefault('MEDIA_PART_SIZE', 8 * 1024 * 1024)
+        config.setdefault('MEDIA_MAX_PART_SIZE', 64 * 1024 * 1024)
+        config.setdefault('MEDIA_MAX_SIZE', 1024 * 1024 * 1024)
+        config.setdefault('MEDIA_UPLOAD_EXPIRES', 86400)
+        config.setdefault('MEDIA_CONTENT_TYPES', {})
+        config.setdefault('MEDIA_PROCESSING_EXECUTOR', 'thread')
+        config.setdefault('MEDIA_WORKERS', 2)
+        config.setdefault('MEDIA_THUMBNAIL_SIZE', (640, 640))
+        config.setdefault('MEDIA_FFMPEG', None)
+        config.setdefault('MEDIA_TRANSCODE_TIMEOUT', 1800)
+        if config['MEDIA_STORAGE'] == 's3':
+            storage = S3Storage(config['MEDIA_S3_BUCKET'],
+                                endpoint_url=config['MEDIA_S3_ENDPOINT_URL'],
+                                region=config['MEDIA_S3_REGION'],
+                                access_key_id=config.get('AWS_ACCESS_KEY_ID'),
+                                secret_access_key=config.get('AWS_SECRET_ACCESS_KEY'))
+        else:
+            storage = LocalStorage(config['MEDIA_ROOT'], self._signing_key(config),
+                                   config['MEDIA_URL'])
+        app.extensions['media'] = _MediaState(storage, config)
+        app.register_error_handler(MediaError, _media_error)
+        app.cli.add_command(abort_stale_uploads)
+
+    @staticmethod
+    def _signing_key(config):
+        return config['MEDIA_SIGNING_KEY'] or config['SECRET_KEY']
+
+    @property
+    def storage(self):
+        return current_app.extensions['media'].storage
+
+    def url(self, key):
+        """A short-lived download URL for ``key``."""
+        return self.storage.url(key, current_app.config['MEDIA_URL_EXPIRES'])
+
+    def verify(self, key, expires, signature):
+        return verify(self._signing_key(current_app.config), key, expires, signature)
+
+    def process(self, key, kind, content_type):
+        """Run the processing hooks for a completed upload in the background."""
+        state = current_app.extensions['media']
+        app = current_app._get_current_object()
+        if state.kind == 'inline':
+            process(app, key, kind, content_type)
+        else:
+            state.get_executor().submit(process, app, key, kind, content_type)
+
+
+media = MediaStore()
+
+
+def _media_error(error):
+    response = jsonify({'error': str(error)})
+    response.status_code = 400
+    return response
+
+
+@click.command('abort-stale-uploads')
+@with_appcontext
+def abort_stale_uploads():
+    """Abort uploads left unfinished for MEDIA_UPLOAD_EXPIRES seconds."""
+    from seagro.models.media import MediaUpload
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['MEDIA_UPLOAD_EXPIRES'])
+    uploads = db.session.scalars(
+        select(MediaUpload)
+        .where(MediaUpload.status == 'uploading', MediaUpload.created_at < cutoff)
+    ).all()
+    for upload in uploads:
+        try:
+            media.storage.abort_upload(upload.key, upload.storage_upload_id)
+        except MediaError as exc:
+            click.echo(f'{upload.id}: {exc}', err=True)
+            continue
+        upload.status = 'aborted'
+    db.session.commit()
+    click.echo(f'Aborted {sum(upload.status == "aborted" for upload in uploads)} uploads')
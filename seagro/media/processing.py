@@ -0,0 +1,68 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from flask import current_app
+
+from seagro.media.storage import copy_stream
+
+logger = logging.getLogger(__name__)
+
+# Files the hooks store next to an upload, served like the upload itself
+THUMBNAIL_SUFFIX = '.thumb.jpg'
+WEB_VIDEO_SUFFIX = '.web.mp4'
+DERIVED_SUFFIXES = (THUMBNAIL_SUFFIX, WEB_VIDEO_SUFFIX)
+
+
+def make_thumbnail(storage, key, content_type):
+    """Store a JPEG thumbnail next to an image as ``<key>.thumb.jpg``."""
+    try:
+        from PIL import Image
+    except ImportError:  # optional; without Pillow images get no thumbnail
+        return
+    with storage.open(key) as source, Image.open(source) as image:
+        image.thumbnail(current_app.config['MEDIA_THUMBNAIL_SIZE'])
+        with tempfile.TemporaryFile() as thumbnail:
+            image.convert('RGB').save(thumbnail, 'JPEG', quality=85)
+            thumbnail.seek(0)
+            storage.save(key + THUMBNAIL_SUFFIX, thumbnail, 'image/jpeg')
+
+
+def transcode(storage, key, content_type):
+    """Store a web-friendly H.264 copy of a video as ``<key>.web.mp4``."""
+    ffmpeg = current_app.config['MEDIA_FFMPEG'] or shutil.which('ffmpeg')
+    if ffmpeg is None:
+        return
+    with tempfile.TemporaryDirectory() as workdir:
+        source_path = os.path.join(workdir, 'source')
+        output_path = os.path.join(workdir, 'web.mp4')
+        with storage.open(key) as source, open(source_path, 'wb') as target:
+            copy_stream(source, target)
+        subprocess.run(
+            [ffmpeg, '-nostdin', '-loglevel', 'error', '-i', source_path,
+             '-c:v', 'libx264', '-preset', 'veryfast', '-c:a', 'aac',
+             '-movflags', '+faststart', output_path],
+            check=True, timeout=current_app.config['MEDIA_TRANSCODE_TIMEOUT']
+        )
+        with open(output_path, 'rb') as output:
+            storage.save(key + WEB_VIDEO_SUFFIX, output, 'video/mp4')
+
+
+# Hooks run after an upload completes, by media kind; each gets
+# (storage, key, content_type) inside an app context
+PROCESSORS = {
+    'image': [make_thumbnail],
+    'video': [transcode],
+}
+
+
+def process(app, key, kind, content_type):
+    with app.app_context():
+        storage = app.extensions['media'].storage
+        for hook in PROCESSORS.get(kind, ()):
+            try:
+                hook(storage, key, content_type)
+            except Exception:
+                logger.exception('Media hook %s failed for %s', hook.__name__, key)
@@ -0,0 +1,225 @@
+import base64
+import hashlib
+import hmac
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from urllib.parse import quote, urlencode
+
+from flask import url_for
+from werkzeug.security import safe_join
+
+# Request bodies and objects are copied in pieces of this size, so memory
+# use doesn't grow with the file
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class MediaError(Exception):
+    """An upload the storage backend rejected (bad part list, part too small, ...)."""
+
+
+def copy_stream(source, target, length=None):
+    """Copy up to ``length`` bytes in chunks; returns (bytes copied, md5 hex)."""
+    digest = hashlib.md5(usedforsecurity=False)
+    copied = 0
+    while length is None or copied < length:
+        size = COPY_CHUNK_SIZE if length is None else min(COPY_CHUNK_SIZE, length - copied)
+        chunk = source.read(size)
+        if not chunk:
+            break
+        target.write(chunk)
+        digest.update(chunk)
+        copied += len(chunk)
+    if length is not None and copied != length:
+        raise MediaError('Upload ended early')
+    return copied, digest.hexdigest()
+
+
+def sign(secret, key, expires):
+    message = f'{key}\n{expires}'.encode()
+    digest = hmac.new(secret.encode(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def verify(secret, key, expires, signature):
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    return expires > time.time() and hmac.compare_digest(sign(secret, key, expires),
+                                                         signature or '')
+
+
+class LocalStorage:
+    """Files under ``root``; parts wait in ``root/.uploads/<upload id>/``.
+
+    Signed URLs point at ``base_url``, where the web server should serve
+    ``root`` after checking the signature, or at the app's own signed-media
+    route (which hands off with ``MEDIA_ACCEL_REDIRECT`` when set).
+    """
+
+    def __init__(self, root, secret, base_url=None):
+        self.root = root
+        self.secret = secret
+        self.base_url = base_url
+
+    def path(self, key):
+        path = safe_join(self.root, key)
+        if path is None:
+            raise MediaError('Invalid key')
+        return path
+
+    def _upload_dir(self, upload_id):
+        return os.path.join(self.root, '.uploads', upload_id)
+
+    def create_upload(self, key, content_type):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._upload_dir(upload_id))
+        return upload_id
+
+    def upload_part(self, key, upload_id, part_number, stream, length):
+        upload_dir = self._upload_dir(upload_id)
+        existing = self.list_parts(key, upload_id)
+        with tempfile.NamedTemporaryFile(dir=upload_dir, suffix='.tmp', delete=False) as part:
+            try:
+                _, etag = copy_stream(stream, part, length)
+            except BaseException:
+                os.unlink(part.name)
+                raise
+        # A retried part replaces the earlier attempt
+        for stored in existing:
+            if stored['part_number'] == part_number:
+                os.unlink(os.path.join(upload_dir, f"{part_number:05d}-{stored['etag']}"))
+        os.replace(part.name, os.path.join(upload_dir, f'{part_number:05d}-{etag}'))
+        return etag
+
+    def list_parts(self, key, upload_id):
+        upload_dir = self._upload_dir(upload_id)
+        if not os.path.isdir(upload_dir):
+            raise MediaError('Unknown upload')
+        parts = []
+        for name in sorted(os.listdir(upload_dir)):
+            if name.endswith('.tmp'):
+                continue
+            part_number, etag = name.split('-')
+            parts.append({'part_number': int(part_number), 'etag': etag,
+                          'size': os.path.getsize(os.path.join(upload_dir, name))})
+        return parts
+
+    def complete_upload(self, key, upload_id, parts):
+        upload_dir = self._upload_dir(upload_id)
+        stored = {part['part_number']: part['etag'] for part in self.list_parts(key, upload_id)}
+        for part in parts:
+            if stored.get(part['part_number']) != part['etag']:
+                raise MediaError(f"Part {part['part_number']} is missing or was replaced")
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as target:
+            try:
+                for part in parts:
+                    name = f"{part['part_number']:05d}-{part['etag']}"
+                    with open(os.path.join(upload_dir, name), 'rb') as source:
+                        size += copy_stream(source, target)[0]
+            except BaseException:
+                os.unlink(target.name)
+                raise
+        os.replace(target.name, path)
+        shutil.rmtree(upload_dir)
+        return size
+
+    def abort_upload(self, key, upload_id):
+        shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def save(self, key, fileobj, content_type):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as target:
+            copy_stream(fileobj, target)
+        os.replace(target.name, path)
+
+    def url(self, key, expires):
+        expires = int(time.time()) + expires
+        signature = sign(self.secret, key, expires)
+        if self.base_url is None:
+            return url_for('api.serve_media', key=key, expires=expires, signature=signature)
+        query = urlencode({'expires': expires, 'signature': signature})
+        return f'{self.base_url.rstrip("/")}/{quote(key)}?{query}'
+
+
+class S3Storage:
+    """An S3 bucket, or any S3-compatible service at ``endpoint_url``.
+
+    Downloads go straight to the bucket through presigned URLs.
+    """
+
+    def __init__(self, bucket, endpoint_url=None, region=None,
+                 access_key_id=None, secret_access_key=None):
+        import boto3
+        from botocore.config import Config as BotoConfig
+        from botocore.exceptions import ClientError
+        # Local stand-ins (MinIO, moto) generally only do path-style addressing
+        config = BotoConfig(s3={'addressing_style': 'path'}) if endpoint_url else None
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region,
+                                   aws_access_key_id=access_key_id,
+                                   aws_secret_access_key=secret_access_key, config=config)
+        self.bucket = bucket
+        self.client_error = ClientError
+
+    def _call(self, method, **params):
+        try:
+            return getattr(self.client, method)(Bucket=self.bucket, **params)
+        except self.client_error as exc:
+            raise MediaError(exc.response.get('Error', {}).get('Message') or str(exc))
+
+    def create_upload(self, key, content_type):
+        return self._call('create_multipart_upload', Key=key, ContentType=content_type)['UploadId']
+
+    def upload_part(self, key, upload_id, part_number, stream, length):
+        # Spooled to disk so the part has a known length and can be resent
+        # on retry without holding it in memory
+        with tempfile.TemporaryFile() as part:
+            copy_stream(stream, part, length)
+            part.seek(0)
+            response = self._call('upload_part', Key=key, UploadId=upload_id,
+                                  PartNumber=part_number, Body=part, ContentLength=length)
+        return response['ETag'].strip('"')
+
+    def list_parts(self, key, upload_id):
+        parts = []
+        marker = 0
+        while True:
+            response = self._call('list_parts', Key=key, UploadId=upload_id,
+                                  PartNumberMarker=marker)
+            parts.extend({'part_number': part['PartNumber'], 'etag': part['ETag'].strip('"'),
+                          'size': part['Size']} for part in response.get('Parts', ()))
+            if not response.get('IsTruncated'):
+                return parts
+            marker = response['NextPartNumberMarker']
+
+    def complete_upload(self, key, upload_id, parts):
+        self._call('complete_multipart_upload', Key=key, UploadId=upload_id, MultipartUpload={
+            'Parts': [{'PartNumber': part['part_number'], 'ETag': f"\"{part['etag']}\""}
+                      for part in parts]
+        })
+        return self._call('head_object', Key=key)['ContentLength']
+
+    def abort_upload(self, key, upload_id):
+        self._call('abort_multipart_upload', Key=key, UploadId=upload_id)
+
+    def open(self, key):
+        return self._call('get_object', Key=key)['Body']
+
+    def save(self, key, fileobj, content_type):
+        # upload_fileobj streams large files as a managed multipart upload
+        self.client.upload_fileobj(fileobj, self.bucket, key,
+                                   ExtraArgs={'ContentType': content_type})
+
+    def url(self, key, expires):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': key}, ExpiresIn=expires)
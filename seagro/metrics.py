@@ -0,0 +1,265 @@
+import cProfile
+import hmac
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import abort, current_app, g, request
+from flask_login import current_user
+
+from seagro.querycount import count_queries
+from seagro.serializers import JSONProvider
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=''):
+    pairs = ['%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield self.name + _format_labels(self.labels, label_values), value
+
+
+class Gauge:
+    """A gauge whose samples are read from ``collect()`` at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels, collect):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.collect = collect
+
+    def samples(self):
+        for label_values, value in self.collect():
+            yield self.name + _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._counts = {}
+        self._sums = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            counts = self._counts.setdefault(label_values, [0] * (len(self.buckets) + 1))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._sums[label_values] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(v), self._sums[k]) for k, v in self._counts.items()]
+        for label_values, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield (self.name + '_bucket' +
+                       _format_labels(self.labels, label_values, 'le="%s"' % bound), cumulative)
+            yield self.name + '_sum' + _format_labels(self.labels, label_values), total
+            yield self.name + '_count' + _format_labels(self.labels, label_values), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{sample} {value:g}' for sample, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class TimedJSONProvider(JSONProvider):
+    """Records how long each request spends encoding JSON."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            if 'metrics_json_seconds' in g:
+                g.metrics_json_seconds += time.perf_counter() - started
+
+
+class Metrics:
+    """Opt-in per-request instrumentation (``METRICS_ENABLED``).
+
+    Records wall time, SQL statement count and duration, JSON encoding time
+    and payload size per endpoint. They are served in Prometheus text format
+    at ``/metrics`` and sent to clients as a ``Server-Timing`` header. With
+    ``PROFILE_SAMPLE_RATE`` set, a sample of requests runs under cProfile and
+    the ones slower than ``PROFILE_SLOW_REQUEST_MS`` are dumped to
+    ``PROFILE_DIR``, keeping the newest ``PROFILE_MAX_FILES``.
+
+    ``/metrics`` answers admins and requests bearing ``METRICS_TOKEN``.
+    Values are per process; scrape every worker.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', False)
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('SERVER_TIMING_ENABLED', True)
+        app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+        app.config.setdefault('PROFILE_SLOW_REQUEST_MS', 500)
+        app.config.setdefault('PROFILE_DIR', 'profiles')
+        app.config.setdefault('PROFILE_MAX_FILES', 50)
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        registry = Registry()
+        labels = ('endpoint', 'method')
+        app.extensions['metrics'] = {
+            'registry': registry,
+            'requests': registry.register(Counter(
+                'seagro_requests_total', 'Requests handled.', labels + ('status',))),
+            'duration': registry.register(Histogram(
+                'seagro_request_duration_seconds', 'Request wall time.', labels)),
+            'sql_queries': registry.register(Counter(
+                'seagro_sql_queries_total', 'SQL statements executed.', labels)),
+            'sql_seconds': registry.register(Counter(
+                'seagro_sql_duration_seconds_total', 'Time spent in SQL statements.', labels)),
+            'json_seconds': registry.register(Counter(
+                'seagro_json_serialization_seconds_total', 'Time spent encoding JSON.', labels)),
+            'response_bytes': registry.register(Counter(
+                'seagro_response_bytes_total', 'Response payload bytes.', labels)),
+            'profile_lock': threading.Lock(),
+        }
+        app.json = TimedJSONProvider(app)
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+        app.teardown_request(_teardown_request)
+        app.add_url_rule('/metrics', 'metrics', _metrics_view)
+
+    def registry(self, app=None):
+        state = (app or current_app).extensions.get('metrics')
+        return state['registry'] if state else None
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_json_seconds = 0.0
+    g.metrics_counting = count_queries()
+    g.metrics_queries = g.metrics_counting.__enter__()
+
+    rate = current_app.config['PROFILE_SAMPLE_RATE']
+    if rate and random.random() < rate:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return
+        g.metrics_profiler = profiler
+
+
+def _teardown_request(exc):
+    counting = g.pop('metrics_counting', None)
+    if counting is not None:
+        counting.__exit__(None, None, None)
+    # Here rather than in after_request so the profiler is stopped after
+    # errors and once streamed responses finish
+    profiler = g.pop('metrics_profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        elapsed = time.perf_counter() - g.metrics_started
+        if elapsed * 1000 >= current_app.config['PROFILE_SLOW_REQUEST_MS']:
+            _save_profile(profiler, request.endpoint or 'unmatched', elapsed,
+                          current_app.extensions['metrics']['profile_lock'])
+
+
+def _finish_request(response):
+    if 'metrics_started' not in g or request.endpoint == 'metrics':
+        return response
+    state = current_app.extensions['metrics']
+    elapsed = time.perf_counter() - g.metrics_started
+    queries = g.metrics_queries
+    labels = (request.endpoint or 'unmatched', request.method)
+
+    state['requests'].inc(labels + (str(response.status_code),))
+    state['duration'].observe(labels, elapsed)
+    state['sql_queries'].inc(labels, queries.count)
+    state['sql_seconds'].inc(labels, queries.duration)
+    state['json_seconds'].inc(labels, g.metrics_json_seconds)
+    if not response.is_streamed:
+        state['response_bytes'].inc(labels, response.content_length or 0)
+
+    if current_app.config['SERVER_TIMING_ENABLED']:
+        response.headers['Server-Timing'] = (
+            'app;dur=%.2f, db;dur=%.2f;desc="%d queries", json;dur=%.2f' % (
+                elapsed * 1000, queries.duration * 1000, queries.count,
+                g.metrics_json_seconds * 1000))
+    return response
+
+
+def _save_profile(profiler, endpoint, elapsed, lock):
+    directory = current_app.config['PROFILE_DIR']
+    name = '%d-%s-%dms.prof' % (time.time_ns(), endpoint.replace('.', '_'), elapsed * 1000)
+    with lock:
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, name))
+        profiles = sorted(f for f in os.listdir(directory) if f.endswith('.prof'))
+        for stale in profiles[:-current_app.config['PROFILE_MAX_FILES']]:
+            os.remove(os.path.join(directory, stale))
+
+
+def _allowed_to_scrape():
+    token = current_app.config['METRICS_TOKEN']
+    auth = request.authorization
+    if token and auth is not None and auth.type == 'bearer':
+        return hmac.compare_digest((auth.token or '').encode(), token.encode())
+    return current_user.is_authenticated and current_user.is_admin
+
+
+def _metrics_view():
+    if not _allowed_to_scrape():
+        abort(403)
+    registry = current_app.extensions['metrics']['registry']
+    return current_app.response_class(registry.render(),
+                                      mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
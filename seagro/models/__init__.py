@@ -1,8 +1,18 @@
 from seagro.models.user import User
 from seagro.models.job import Job, JobApplication
+from seagro.models.course import Course, CourseEnrollment
+from seagro.models.post import Post, Follow
+from seagro.models.mail import OutboundEmail
+from seagro.models.media import MediaUpload
 
 __all__ = [
     'User',
     'Job',
-    'JobApplication'
+    'JobApplication',
+    'Course',
+    'CourseEnrollment',
+    'Post',
+    'Follow',
+    'OutboundEmail',
+    'MediaUpload'
 ]
@@ -7,11 +7,18 @@ class Course(db.Model):
     description = db.Column(db.Text, nullable=False)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Maintained by enroll_course; `flask reconcile-counters` repairs drift
+    enrollment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationship with enrollments
     enrollments = db.relationship('CourseEnrollment', backref='course', lazy=True)
 
 class CourseEnrollment(db.Model):
+    __table_args__ = (
+        # One enrollment per user per course; also serves user_id lookups
+        db.Index('uq_course_enrollment_user_course', 'user_id', 'course_id', unique=True),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
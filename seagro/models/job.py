@@ -1,8 +1,14 @@
 from datetime import datetime
 from seagro import db
 
+APPLICATION_STATUSES = ('pending', 'accepted', 'rejected')
+
 class Job(db.Model):
     __tablename__ = 'job'
+    __table_args__ = (
+        # Backs keyset pagination over (created_at, id) in GET /api/jobs
+        db.Index('ix_job_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -12,7 +18,9 @@ class Job(db.Model):
     salary = db.Column(db.String(50))
     requirements = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    # Maintained by apply_job; `flask reconcile-counters` repairs drift
+    applicant_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     applications = db.relationship('JobApplication', backref='job', lazy='dynamic')
 
     def __repr__(self):
@@ -20,6 +28,10 @@ class Job(db.Model):
 
 class JobApplication(db.Model):
     __tablename__ = 'job_application'
+    __table_args__ = (
+        # One application per applicant per job; also serves job_id lookups
+        db.Index('uq_job_application_job_applicant', 'job_id', 'applicant_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.Integer, db.ForeignKey('job.id'), nullable=False)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from seagro import db
+
+OUTBOUND_EMAIL_STATUSES = ('pending', 'sending', 'sent', 'failed')
+
+class OutboundEmail(db.Model):
+    __tablename__ = 'outbound_email'
+    __table_args__ = (
+        # The mail worker claims due rows by (status, next_attempt_at)
+        db.Index('ix_outbound_email_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<OutboundEmail {self.id} to {self.recipient} ({self.status})>'
@@ -0,0 +1,26 @@
+from datetime import datetime
+from seagro import db
+
+MEDIA_UPLOAD_STATUSES = ('uploading', 'complete', 'aborted')
+
+class MediaUpload(db.Model):
+    __tablename__ = 'media_upload'
+    __table_args__ = (
+        # Stale upload cleanup scans by (status, created_at)
+        db.Index('ix_media_upload_status_created_at', 'status', 'created_at'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)  # random hex, used in upload URLs
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    key = db.Column(db.String(255), nullable=False, unique=True)
+    kind = db.Column(db.String(10), nullable=False)  # image, video
+    content_type = db.Column(db.String(100), nullable=False)
+    storage_upload_id = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='uploading')  # uploading, complete, aborted
+    declared_size = db.Column(db.BigInteger)  # what the client announced; parts may not exceed it
+    size = db.Column(db.BigInteger)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<MediaUpload {self.id} {self.key} ({self.status})>'
@@ -2,6 +2,11 @@ from datetime import datetime
 from seagro import db
 
 class Post(db.Model):
+    __table_args__ = (
+        # Backs an author's newest-first posts (timeline rebuilds, fan-out-on-read)
+        db.Index('ix_post_user_id_id', 'user_id', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     image_url = db.Column(db.String(256))
@@ -11,3 +16,16 @@ class Post(db.Model):
     
     def __repr__(self):
         return f'<Post {self.id}>'
+
+class Follow(db.Model):
+    __table_args__ = (
+        # One follow per pair; also serves "who does this user follow"
+        db.Index('uq_follow_follower_followed', 'follower_id', 'followed_id', unique=True),
+        # Fan-out reads an author's followers
+        db.Index('ix_follow_followed_id_follower_id', 'followed_id', 'follower_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    follower_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    followed_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,11 +1,22 @@
 from datetime import datetime
 from seagro import db, login_manager
-from werkzeug.security import generate_password_hash, check_password_hash
+from seagro.hashing import password_hasher
+from seagro.identity import user_cache
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
 from flask_login import UserMixin
 
 @login_manager.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    id = int(id)
+    data = user_cache.get(id)
+    if data is not None:
+        return User.from_cache(data)
+    
+    user = db.session.get(User, id)
+    if user is not None:
+        user_cache.set(id, user.to_cache())
+    return user
 
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
@@ -21,19 +32,61 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     is_admin = db.Column(db.Boolean, default=False)
+    # Maintained by follow/unfollow; `flask reconcile-counters` repairs drift
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Job Portal relationships
     jobs = db.relationship('Job', backref='author', lazy='dynamic')
     applications = db.relationship('JobApplication', backref='applicant', lazy='dynamic')
+    posts = db.relationship('Post', backref='author', lazy='dynamic')
     
     # Add to existing User model
     courses_enrolled = db.relationship('CourseEnrollment', backref='user', lazy=True)
 
+    # Columns kept in the identity cache; password_hash is deliberately left
+    # out and lazy-loads on the rare paths that need it.
+    CACHED_COLUMNS = (
+        'id', 'username', 'email', 'first_name', 'last_name', 'bio',
+        'location', 'created_at', 'is_active', 'is_admin'
+    )
+    
+    def to_cache(self):
+        return {name: getattr(self, name) for name in self.CACHED_COLUMNS}
+    
+    @classmethod
+    def from_cache(cls, data):
+        # Attach the cached row to the session as a persistent instance without
+        # emitting a SELECT; uncached columns are expired and load on access.
+        user = cls(**data)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
     
     def __repr__(self):
         return f'<User {self.username}>'
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+    # Evict again once the transaction is visible, in case a concurrent
+    # request re-cached the old row in between
+    object_session(target).info.setdefault('stale_user_ids', set()).add(target.id)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop('stale_user_ids', ()):
+        user_cache.invalidate(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_stale_users(session):
+    session.info.pop('stale_user_ids', None)
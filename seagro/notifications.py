@@ -0,0 +1,160 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from flask_login import current_user
+
+EVENT_NAME = 'notifications'
+
+
+def user_room(user_id):
+    return f'user:{user_id}'
+
+
+def _on_connect(auth=None):
+    # Anonymous sockets are refused; everyone else listens on their own room
+    if not current_user.is_authenticated:
+        return False
+    from flask_socketio import join_room
+    join_room(user_room(current_user.id))
+
+
+def register_socket_handlers(socketio):
+    socketio.on_event('connect', _on_connect)
+
+
+def _merge(pending, event):
+    # List fields accumulate, everything else keeps the newest value
+    for field, value in event.items():
+        if isinstance(value, list):
+            pending.setdefault(field, []).extend(value)
+        else:
+            pending[field] = value
+
+
+class _Outbox:
+    """Events waiting for the end of their coalescing window.
+
+    Bursts aimed at the same room are merged by ``(type, key)`` and sent as
+    a single ``notifications`` event carrying a list.
+    """
+
+    def __init__(self, socketio, window):
+        self.socketio = socketio
+        self.window = window
+        self.pending = OrderedDict()  # room -> {(type, key): event}
+        self.lock = threading.Lock()
+        self.scheduled = False
+
+    def add(self, room, key, event):
+        self.add_many([(room, key, event)])
+
+    def add_many(self, items):
+        with self.lock:
+            for room, key, event in items:
+                events = self.pending.setdefault(room, OrderedDict())
+                if key in events:
+                    _merge(events[key], event)
+                else:
+                    events[key] = dict(event)
+            schedule = bool(self.window) and not self.scheduled
+            if schedule:
+                self.scheduled = True
+        if schedule:
+            # A green thread under eventlet/gevent, a real one otherwise
+            self.socketio.start_background_task(self._flush_later)
+        elif not self.window:
+            self.flush()
+
+    def _flush_later(self):
+        self.socketio.sleep(self.window)
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, OrderedDict()
+            self.scheduled = False
+        # With SOCKETIO_MESSAGE_QUEUE set this publishes to the queue and
+        # whichever worker holds the socket delivers it
+        for room, events in batch.items():
+            self.socketio.emit(EVENT_NAME, {'events': list(events.values())}, to=room)
+
+
+class Notifier:
+    """Pushes events to per-user Socket.IO rooms.
+
+    Publishing from a view initializes Flask-SocketIO on first use, so fast
+    boot still skips it until something is sent. Events are held for
+    ``NOTIFICATION_COALESCE_MS`` to merge bursts; 0 sends each immediately.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('NOTIFICATIONS_ENABLED', True)
+        app.config.setdefault('NOTIFICATION_COALESCE_MS', 250)
+        app.config.setdefault('SOCKETIO_MESSAGE_QUEUE', None)
+        app.extensions['notifier'] = {'outbox': None, 'lock': threading.Lock()}
+
+    def _outbox(self):
+        state = current_app.extensions['notifier']
+        if state['outbox'] is None:
+            from seagro import init_extension
+            socketio = init_extension('socketio')
+            with state['lock']:
+                if state['outbox'] is None:
+                    state['outbox'] = _Outbox(
+                        socketio, current_app.config['NOTIFICATION_COALESCE_MS'] / 1000.0)
+        return state['outbox']
+
+    def publish(self, user_id, type, key, **payload):
+        """Queue a ``type`` event for ``user_id``; call after the commit.
+
+        Events with the same ``type`` and ``key`` inside one window are merged.
+        """
+        if not current_app.config['NOTIFICATIONS_ENABLED']:
+            return
+        self.publish_many([(user_id, type, key, payload)])
+
+    def publish_many(self, events):
+        """Queue ``(user_id, type, key, payload)`` events as one batch.
+
+        They go out together in a single flush, even with coalescing off.
+        """
+        if not current_app.config['NOTIFICATIONS_ENABLED'] or not events:
+            return
+        self._outbox().add_many([
+            (user_room(user_id), (type, key), dict(payload, type=type))
+            for user_id, type, key, payload in events
+        ])
+
+    def flush(self):
+        outbox = current_app.extensions['notifier']['outbox']
+        if outbox is not None:
+            outbox.flush()
+
+    def application_received(self, job, application):
+        self.publish(job.author_id, 'application.received', job.id,
+                     job_id=job.id, application_ids=[application.id])
+
+    def application_status_changed(self, application):
+        self.publish(application.applicant_id, 'application.status', application.id,
+                     job_id=application.job_id, application_id=application.id,
+                     status=application.status)
+
+    def application_statuses_changed(self, job_id, status, applications):
+        """Tell each applicant in ``applications`` ((id, applicant_id) rows).
+
+        One batch for the whole job: a single outbox flush with one emit
+        per applicant's room.
+        """
+        self.publish_many([
+            (applicant_id, 'application.status', application_id,
+             {'job_id': job_id, 'application_id': application_id, 'status': status})
+            for application_id, applicant_id in applications
+        ])
+
+
+notifier = Notifier()
@@ -0,0 +1,203 @@
+import atexit
+import logging
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import bindparam, select, update
+
+from seagro import cache, db
+from seagro.models.course import CourseEnrollment
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStorage:
+    """Pending progress for this process, latest value per enrollment."""
+
+    def __init__(self):
+        self._pending = {}  # (user_id, course_id) -> progress
+        self._lock = threading.Lock()
+
+    def put(self, updates):
+        with self._lock:
+            self._pending.update(updates)
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, updates):
+        # Put back a batch that failed to write, unless newer values arrived
+        with self._lock:
+            for key, progress in updates.items():
+                self._pending.setdefault(key, progress)
+
+
+# Read and clear the pending hash in one step
+TAKE_SCRIPT = """
+local items = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return items
+"""
+
+
+class RedisStorage:
+    """Pending progress shared by every worker in one Redis hash."""
+
+    def __init__(self, url, key):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+        self.key = key
+
+    def put(self, updates):
+        self.client.hset(self.key, mapping={
+            f'{user_id}:{course_id}': progress
+            for (user_id, course_id), progress in updates.items()
+        })
+
+    def take(self):
+        items = self.script(keys=[self.key])
+        pending = {}
+        for field, progress in zip(items[::2], items[1::2]):
+            user_id, course_id = field.split(b':')
+            pending[int(user_id), int(course_id)] = int(progress)
+        return pending
+
+    def restore(self, updates):
+        with self.client.pipeline() as pipe:
+            for (user_id, course_id), progress in updates.items():
+                pipe.hsetnx(self.key, f'{user_id}:{course_id}', progress)
+            pipe.execute()
+
+
+def _enrolled_key(user_id, course_id):
+    return f'enrolled:{user_id}:{course_id}'
+
+
+def enrolled(user_id, course_ids):
+    """The subset of ``course_ids`` ``user_id`` is enrolled in.
+
+    Enrollments are never removed, so positive answers are cached and a
+    learner's progress pings after the first don't touch the database.
+    """
+    course_ids = set(course_ids)
+    keys = [_enrolled_key(user_id, course_id) for course_id in course_ids]
+    found = {course_id for course_id, hit in zip(course_ids, cache.get_many(*keys)) if hit}
+    missing = course_ids - found
+    if missing:
+        rows = set(db.session.scalars(
+            select(CourseEnrollment.course_id)
+            .where(CourseEnrollment.user_id == user_id,
+                   CourseEnrollment.course_id.in_(missing))
+        ))
+        if rows:
+            cache.set_many({_enrolled_key(user_id, course_id): True for course_id in rows})
+        found |= rows
+    return found
+
+
+# One statement executed for the whole batch (executemany)
+_UPDATE_PROGRESS = update(CourseEnrollment.__table__)\
+    .where(CourseEnrollment.__table__.c.user_id == bindparam('b_user_id'),
+           CourseEnrollment.__table__.c.course_id == bindparam('b_course_id'))\
+    .values(progress=bindparam('b_progress'))
+
+
+def write(updates):
+    """Write ``{(user_id, course_id): progress}`` to ``course_enrollment``."""
+    if not updates:
+        return
+    db.session.execute(_UPDATE_PROGRESS, [
+        {'b_user_id': user_id, 'b_course_id': course_id, 'b_progress': progress}
+        for (user_id, course_id), progress in updates.items()
+    ])
+    db.session.commit()
+
+
+class _Flusher:
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                # Once per buffer, and only for one that ever held updates
+                atexit.register(self.flush)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='progress-buffer', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        interval = self.app.config['PROGRESS_FLUSH_INTERVAL']
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def flush(self):
+        with self.app.app_context():
+            try:
+                progress_buffer.flush()
+            except Exception:
+                logger.exception('Flushing course progress failed')
+            finally:
+                db.session.remove()
+
+
+class ProgressBuffer:
+    """Write-behind buffer for course progress.
+
+    Players report progress every few seconds; ``record`` keeps only the
+    latest value per enrollment and a background thread writes what is
+    pending every ``PROGRESS_FLUSH_INTERVAL`` seconds as one batched UPDATE.
+    ``PROGRESS_STORAGE`` is ``'memory'`` (per process, flushed again at
+    exit) or ``'redis'`` (shared, at ``PROGRESS_REDIS_URL``). With
+    ``PROGRESS_BUFFER_ENABLED`` off every update is written immediately.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROGRESS_BUFFER_ENABLED', True)
+        app.config.setdefault('PROGRESS_BUFFER_THREAD', True)
+        app.config.setdefault('PROGRESS_FLUSH_INTERVAL', 10)
+        app.config.setdefault('PROGRESS_STORAGE', 'memory')
+        app.config.setdefault('PROGRESS_REDIS_URL', app.config.get('REDIS_URL'))
+        if app.config['PROGRESS_STORAGE'] == 'redis':
+            storage = RedisStorage(app.config['PROGRESS_REDIS_URL'],
+                                   app.config.get('CACHE_KEY_PREFIX', '') + 'progress:pending')
+        else:
+            storage = MemoryStorage()
+        flusher = _Flusher(app)
+        app.extensions['progress_buffer'] = (storage, flusher)
+
+    def record(self, updates):
+        """Accept ``{(user_id, course_id): progress}`` for enrolled pairs."""
+        config = current_app.config
+        if not config['PROGRESS_BUFFER_ENABLED']:
+            return write(updates)
+        storage, flusher = current_app.extensions['progress_buffer']
+        storage.put(updates)
+        if config['PROGRESS_BUFFER_THREAD']:
+            flusher.start()
+
+    def flush(self):
+        """Write everything pending; returns the number of enrollments updated."""
+        storage, _ = current_app.extensions['progress_buffer']
+        updates = storage.take()
+        try:
+            write(updates)
+        except Exception:
+            db.session.rollback()
+            storage.restore(updates)
+            raise
+        return len(updates)
+
+
+progress_buffer = ProgressBuffer()
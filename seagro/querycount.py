@@ -0,0 +1,81 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_active_counters = contextvars.ContextVar('active_query_counters', default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCount:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    if _active_counters.get():
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    counters = _active_counters.get()
+    if not counters:
+        return
+    starts = conn.info.get('query_start')
+    elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+    for counter in counters:
+        counter.count += 1
+        counter.duration += elapsed
+        counter.statements.append(statement)
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements executed in this context (nesting is allowed)."""
+    counter = QueryCount()
+    token = _active_counters.set(_active_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _active_counters.reset(token)
+
+
+def _budgets_enforced():
+    enforced = current_app.config.get('QUERY_BUDGETS_ENFORCED')
+    if enforced is None:
+        return current_app.debug or current_app.testing
+    return enforced
+
+
+def query_budget(limit):
+    """Fail a view that issues more than ``limit`` SQL statements.
+
+    Only enforced in debug/testing (or with QUERY_BUDGETS_ENFORCED), so a
+    missing eager load shows up as a failing test rather than as a slow
+    listing page in production.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _budgets_enforced():
+                return f(*args, **kwargs)
+            with count_queries() as counter:
+                response = f(*args, **kwargs)
+            if counter.count > limit:
+                raise QueryBudgetExceeded(
+                    '%s issued %d queries, budget is %d:\n%s' % (
+                        f.__name__, counter.count, limit, '\n'.join(counter.statements)))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,178 @@
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+from flask import current_app, jsonify, request
+from flask_login import current_user
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+LIMIT_RE = re.compile(r'^\s*(\d+)\s*/\s*(second|minute|hour|day)s?\s*$')
+
+
+class RateLimited(Exception):
+    """Raised when a request has used up one of its token buckets."""
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+@lru_cache(maxsize=None)
+def parse_limit(limit):
+    """'10/minute' -> (capacity, tokens refilled per second)."""
+    match = LIMIT_RE.match(limit)
+    if match is None:
+        raise ValueError(f'Invalid rate limit {limit!r}')
+    capacity = int(match.group(1))
+    return capacity, capacity / PERIODS[match.group(2)]
+
+
+class MemoryStorage:
+    """Per-process buckets, oldest evicted first beyond ``max_keys``."""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+# Refill and take a token atomically; buckets expire once they'd be full
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisStorage:
+    """Buckets shared by every worker through Redis."""
+
+    def __init__(self, url, prefix):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+        self.prefix = prefix
+
+    def consume(self, key, capacity, rate):
+        allowed, tokens = self.script(keys=[self.prefix + key],
+                                      args=[capacity, rate, time.time()])
+        return bool(allowed), float(tokens)
+
+
+def by_ip():
+    return request.remote_addr
+
+
+def by_account():
+    # The account being logged into, read before any lookup or hashing
+    data = request.get_json(silent=True)
+    email = data.get('email') if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def by_user():
+    return current_user.get_id() if current_user.is_authenticated else None
+
+
+by_ip.key_name = 'ip'
+by_account.key_name = 'account'
+by_user.key_name = 'user'
+
+
+class RateLimiter:
+    """Token-bucket limits per client, checked before the view runs.
+
+    Limits come from ``RATELIMITS``, keyed ``'<scope>:<key>'`` (for example
+    ``'login:ip': '20/minute'``); a scope/key pair with no entry is
+    unlimited. ``RATELIMIT_STORAGE`` is ``'memory'`` (per process) or
+    ``'redis'`` (shared, at ``RATELIMIT_REDIS_URL``).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMITS', {})
+        app.config.setdefault('RATELIMIT_STORAGE', 'memory')
+        app.config.setdefault('RATELIMIT_REDIS_URL', app.config.get('REDIS_URL'))
+        app.config.setdefault('RATELIMIT_MAX_KEYS', 100000)
+        if app.config['RATELIMIT_STORAGE'] == 'redis':
+            storage = RedisStorage(app.config['RATELIMIT_REDIS_URL'],
+                                   app.config.get('CACHE_KEY_PREFIX', '') + 'ratelimit:')
+        else:
+            storage = MemoryStorage(app.config['RATELIMIT_MAX_KEYS'])
+        app.extensions['rate_limiter'] = storage
+        app.register_error_handler(RateLimited, _rate_limited)
+
+    def hit(self, scope, *keys):
+        """Take a token from each of the request's buckets in ``scope``."""
+        config = current_app.config
+        if not config['RATELIMIT_ENABLED']:
+            return
+        storage = current_app.extensions['rate_limiter']
+        for key in keys:
+            limit = config['RATELIMITS'].get(f'{scope}:{key.key_name}')
+            value = key() if limit else None
+            if value is None:
+                continue
+            capacity, rate = parse_limit(limit)
+            allowed, tokens = storage.consume(f'{scope}:{key.key_name}:{value}',
+                                              capacity, rate)
+            if not allowed:
+                raise RateLimited(math.ceil((1 - tokens) / rate))
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limit(scope, *keys):
+    """Reject the request with 429 once any of its ``keys`` runs dry.
+
+    Runs before the view, so a throttled login never reaches the database or
+    the password hasher. Place it below ``login_required`` when keyed
+    ``by_user``.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            rate_limiter.hit(scope, *keys)
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _rate_limited(error):
+    response = jsonify({'error': 'Too many requests, please retry later'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(error.retry_after, 1))
+    return response
@@ -0,0 +1,350 @@
+import bisect
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, jsonify
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import load_only
+
+from seagro import db
+from seagro.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of a term hit in each indexed column
+FIELD_WEIGHTS = {
+    'title': 5.0,
+    'description': 1.0,
+    'requirements': 2.0,
+    'company': 3.0,
+    'location': 2.0,
+}
+FIELDS = tuple(FIELD_WEIGHTS)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+FTS_TABLE = 'job_fts'
+FTS_CREATE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{', '.join(FIELDS)}, content='job', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+
+# Keep the FTS table's lifecycle tied to the job table it indexes
+event.listen(Job.__table__, 'after_create', DDL(FTS_CREATE).execute_if(dialect='sqlite'))
+event.listen(Job.__table__, 'before_drop',
+             DDL(f'DROP TABLE IF EXISTS {FTS_TABLE}').execute_if(dialect='sqlite'))
+
+
+def tokenize(value):
+    return TOKEN_RE.findall(value.lower()) if value else []
+
+
+class SQLiteFTSIndex:
+    name = 'fts5'
+
+    def __init__(self):
+        self._ready = False
+
+    def _ensure_table(self, connection):
+        if self._ready:
+            return
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE}
+        ).scalar()
+        if not exists:
+            connection.execute(text(FTS_CREATE))
+            self._rebuild(connection)
+        self._ready = True
+
+    def _rebuild(self, connection):
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+    def add(self, jobs):
+        # Part of the caller's transaction: flushed here, committed by the caller
+        self._ensure_table(db.session.connection())
+        db.session.execute(
+            text(f"INSERT INTO {FTS_TABLE}(rowid, {', '.join(FIELDS)}) "
+                 f"VALUES (:id, {', '.join(':' + f for f in FIELDS)})"),
+            [dict({f: getattr(job, f) for f in FIELDS}, id=job.id) for job in jobs]
+        )
+
+    def rebuild(self):
+        # Its own transaction on the primary, whatever the session is doing
+        with db.engine.begin() as connection:
+            self._ensure_table(connection)
+            self._rebuild(connection)
+
+    def search(self, terms, location=None, company=None, limit=10, offset=0):
+        if not self._ready:
+            # Creating the table is a write, even inside a GET
+            with db.engine.begin() as connection:
+                self._ensure_table(connection)
+        # Quote every term so user input can never inject FTS query syntax,
+        # and allow prefix matches on each one.
+        match = ' '.join('"%s"*' % term for term in terms)
+        weights = ', '.join(str(FIELD_WEIGHTS[f]) for f in FIELDS)
+        sql = (f"SELECT job.id, bm25({FTS_TABLE}, {weights}) AS rank "
+               f"FROM {FTS_TABLE} JOIN job ON job.id = {FTS_TABLE}.rowid "
+               f"WHERE {FTS_TABLE} MATCH :match")
+        params = {'match': match, 'limit': limit, 'offset': offset}
+        if location:
+            sql += ' AND lower(job.location) = lower(:location)'
+            params['location'] = location
+        if company:
+            sql += ' AND lower(job.company) = lower(:company)'
+            params['company'] = company
+        sql += ' ORDER BY rank LIMIT :limit OFFSET :offset'
+
+        # FTS5's bm25() is "lower is better"; flip it so scores read naturally
+        return [(row.id, -row.rank) for row in db.session.execute(text(sql), params)]
+
+
+# created_at is set before the insert commits, so each catch-up pass looks
+# this far behind the previous one
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class SearchUnavailable(Exception):
+    """Raised while the in-memory index is still being loaded."""
+
+
+class InMemoryIndex:
+    """Inverted index with BM25 ranking for databases without FTS5.
+
+    Each process holds its own copy, loaded by a background thread when the
+    index is created (at startup, or on first use); searches wait at most
+    ``load_timeout`` seconds for it. Jobs created by other workers are picked
+    up from the database at most ``sync_interval`` seconds after they commit.
+    Like FTS5's ``"term"*``, every query term also matches longer words.
+    """
+
+    name = 'memory'
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, app, sync_interval=5, load_timeout=1):
+        self.app = app
+        self.sync_interval = sync_interval
+        self.load_timeout = load_timeout
+        self._lock = threading.RLock()
+        self._loaded = threading.Event()
+        self._loader = None
+        self._loader_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._postings = defaultdict(dict)  # term -> {job_id: weighted tf}
+        self._vocabulary = []               # sorted terms, for prefix matches
+        self._terms = {}                    # job_id -> terms it is posted under
+        self._lengths = {}                  # job_id -> weighted length
+        self._filters = {}                  # job_id -> (location, company)
+        self._total_length = 0.0
+        self._synced_from = None
+        self._next_sync = 0.0
+
+    def start_loading(self):
+        with self._loader_lock:
+            if self._loaded.is_set() or (self._loader is not None and self._loader.is_alive()):
+                return
+            self._loader = threading.Thread(target=self._load_in_background,
+                                            name='search-index', daemon=True)
+            self._loader.start()
+
+    def _load_in_background(self):
+        with self.app.app_context():
+            try:
+                self.rebuild()
+            except Exception:
+                logger.exception('Loading the job search index failed')
+            finally:
+                db.session.remove()
+
+    def _sync(self, since=None):
+        started = datetime.utcnow()
+        query = Job.query.options(load_only(*[getattr(Job, f) for f in FIELDS]))
+        if since is not None:
+            # Jobs added since the last pass (ix_job_created_at_id)
+            query = query.filter(Job.created_at >= since - SYNC_OVERLAP)
+        for job in query.yield_per(1000):
+            self._add(job)
+        self._synced_from = started
+        self._next_sync = time.monotonic() + self.sync_interval
+
+    def _add(self, job):
+        if job.id in self._lengths:
+            self._remove(job.id)
+        length = 0.0
+        terms = set()
+        for field in FIELDS:
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(getattr(job, field)):
+                if term not in self._postings:
+                    bisect.insort(self._vocabulary, term)
+                postings = self._postings[term]
+                postings[job.id] = postings.get(job.id, 0.0) + weight
+                terms.add(term)
+                length += weight
+        self._terms[job.id] = terms
+        self._lengths[job.id] = length
+        self._total_length += length
+        self._filters[job.id] = ((job.location or '').lower(), (job.company or '').lower())
+
+    def _remove(self, job_id):
+        for term in self._terms.pop(job_id):
+            postings = self._postings[term]
+            postings.pop(job_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+        self._total_length -= self._lengths.pop(job_id)
+        self._filters.pop(job_id, None)
+
+    def _matching(self, term):
+        # Postings of every indexed word starting with ``term``, merged
+        start = end = bisect.bisect_left(self._vocabulary, term)
+        while end < len(self._vocabulary) and self._vocabulary[end].startswith(term):
+            end += 1
+        if end - start == 1:
+            return self._postings[self._vocabulary[start]]
+        merged = {}
+        for word in self._vocabulary[start:end]:
+            for job_id, tf in self._postings[word].items():
+                merged[job_id] = merged.get(job_id, 0.0) + tf
+        return merged
+
+    def add(self, jobs):
+        if not self._loaded.is_set():
+            # The load in progress (or the next sync) picks these up
+            return
+        with self._lock:
+            for job in jobs:
+                self._add(job)
+
+    def rebuild(self):
+        with self._lock:
+            self._reset()
+            self._sync()
+        self._loaded.set()
+
+    def search(self, terms, location=None, company=None, limit=10, offset=0):
+        if not self._loaded.is_set():
+            self.start_loading()
+            if not self._loaded.wait(self.load_timeout):
+                raise SearchUnavailable()
+        with self._lock:
+            if time.monotonic() >= self._next_sync:
+                self._sync(self._synced_from)
+            postings = [self._matching(term) for term in terms]
+            if not postings or not all(postings):
+                return []
+
+            # Match every term, starting from the rarest one
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for p in postings[1:]:
+                candidates.intersection_update(p)
+
+            location = location.lower() if location else None
+            company = company.lower() if company else None
+            doc_count = len(self._lengths)
+            avg_length = self._total_length / doc_count
+            idfs = [math.log(1 + (doc_count - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+
+            def score(job_id):
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[job_id] / avg_length)
+                total = 0.0
+                for p, idf in zip(postings, idfs):
+                    tf = p[job_id]
+                    total += idf * tf * (self.k1 + 1) / (tf + norm)
+                return total
+
+            scored = []
+            for job_id in candidates:
+                job_location, job_company = self._filters[job_id]
+                if location and job_location != location:
+                    continue
+                if company and job_company != company:
+                    continue
+                scored.append((job_id, score(job_id)))
+
+            return heapq.nlargest(offset + limit, scored, key=lambda r: r[1])[offset:]
+
+
+class JobSearch:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_BACKEND', 'auto')
+        app.config.setdefault('SEARCH_SYNC_INTERVAL', 5)
+        app.config.setdefault('SEARCH_LOAD_TIMEOUT', 1)
+        app.config.setdefault('SEARCH_PRELOAD', True)
+        app.extensions['job_search'] = {'backend': None}
+        app.register_error_handler(SearchUnavailable, _search_unavailable)
+        app.cli.add_command(reindex_jobs)
+        if app.config['SEARCH_PRELOAD'] and self._choice(app) == 'memory':
+            # Load in the background now rather than inside the first search
+            with app.app_context():
+                self.backend.start_loading()
+
+    @staticmethod
+    def _choice(app):
+        choice = app.config['SEARCH_BACKEND']
+        if choice == 'auto':
+            backend = make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+            choice = 'fts5' if backend == 'sqlite' else 'memory'
+        return choice
+
+    @property
+    def backend(self):
+        state = current_app.extensions['job_search']
+        if state['backend'] is None:
+            app = current_app._get_current_object()
+            if self._choice(app) == 'fts5':
+                state['backend'] = SQLiteFTSIndex()
+            else:
+                state['backend'] = InMemoryIndex(app, app.config['SEARCH_SYNC_INTERVAL'],
+                                                 app.config['SEARCH_LOAD_TIMEOUT'])
+        return state['backend']
+
+    def index(self, jobs):
+        self.backend.add(jobs)
+
+    def search(self, query, **kwargs):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        return self.backend.search(terms, **kwargs)
+
+    def rebuild(self):
+        self.backend.rebuild()
+
+
+job_search = JobSearch()
+
+
+def _search_unavailable(error):
+    response = jsonify({'error': 'Search is starting up, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
+
+@click.command('reindex-jobs')
+@with_appcontext
+def reindex_jobs():
+    """Rebuild the job full-text search index."""
+    job_search.rebuild()
+    click.echo(f'Rebuilt {job_search.backend.name} job search index')
@@ -0,0 +1,106 @@
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+
+from seagro.models.course import Course
+from seagro.models.job import Job, JobApplication
+from seagro.models.post import Post
+from seagro.models.user import User
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same JSON
+    orjson = None
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Encodes with orjson when it is installed.
+
+    Dates and datetimes become ISO 8601 strings with either backend, so
+    views can hand rows straight to ``jsonify`` without formatting them.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        # orjson output is always compact; anything else (e.g. the indent
+        # used in debug) goes through the stdlib encoder
+        if orjson is None or kwargs.keys() - {'separators'}:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+
+class Schema:
+    """The columns a resource exposes, selected as plain rows.
+
+    ``select()`` builds a statement over just those columns (nested schemas
+    need the caller to add the join) and ``dump()`` turns each result row
+    into the dict that is sent, without loading ORM objects.
+    """
+
+    def __init__(self, model, *fields, **nested):
+        self.model = model
+        self.fields = fields
+        self.nested = nested
+        self.width = len(fields) + sum(schema.width for schema in nested.values())
+
+    def extend(self, *fields):
+        """A copy of this schema that also exposes ``fields``."""
+        return Schema(self.model, *self.fields, *fields, **self.nested)
+
+    def columns(self):
+        columns = [getattr(self.model, field) for field in self.fields]
+        for schema in self.nested.values():
+            columns.extend(schema.columns())
+        return columns
+
+    def select(self):
+        return select(*self.columns())
+
+    def dump(self, row):
+        data = dict(zip(self.fields, row))
+        start = len(self.fields)
+        for name, schema in self.nested.items():
+            data[name] = schema.dump(row[start:start + schema.width])
+            start += schema.width
+        return data
+
+    def dump_many(self, rows):
+        return [self.dump(row) for row in rows]
+
+    def dump_object(self, obj):
+        data = {field: getattr(obj, field) for field in self.fields}
+        for name, schema in self.nested.items():
+            data[name] = schema.dump_object(getattr(obj, name))
+        return data
+
+
+USER_SUMMARY = Schema(User, 'id', 'username')
+USER_ACCOUNT = Schema(User, 'id', 'username', 'email')
+USER_PROFILE = Schema(User, 'id', 'username', 'email', 'first_name', 'last_name')
+
+# Listings never show the description, so don't pull it off disk
+JOB_SUMMARY = Schema(Job, 'id', 'title', 'company', 'location', 'salary',
+                     'requirements', 'applicant_count', 'created_at')
+JOB_DETAIL = Schema(Job, 'id', 'title', 'company', 'location', 'description',
+                    'requirements', 'salary', 'applicant_count', 'created_at',
+                    author=USER_SUMMARY)
+
+APPLICATION = Schema(JobApplication, 'id', 'job_id', 'applicant_id', 'cover_letter',
+                     'resume', 'status', 'created_at', applicant=USER_SUMMARY)
+
+# Course bodies can run to megabytes; they are served by the range-capable
+# content endpoint and only inlined when a client asks for them
+COURSE_SUMMARY = Schema(Course, 'id', 'title', 'enrollment_count', 'created_at')
+COURSE_DETAIL = COURSE_SUMMARY.extend('description')
+
+POST = Schema(Post, 'id', 'content', 'image_url', 'video_url', 'created_at',
+              author=USER_SUMMARY)
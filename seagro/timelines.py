@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import select
+
+from seagro import cache, db
+from seagro.database import use_primary
+from seagro.models.post import Follow, Post
+from seagro.models.user import User
+
+# Ends a timeline that holds every post it covers; a timeline trimmed to
+# TIMELINE_MAX_LENGTH loses it and older pages are read from the database
+COMPLETE = 0
+
+
+class MemoryStorage:
+    """Timelines for this process, least recently read evicted beyond ``max_users``.
+
+    Posts fanned out by other workers never reach these, so each is rebuilt
+    ``ttl`` seconds after it was built.
+    """
+
+    def __init__(self, max_users, ttl):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._timelines = OrderedDict()  # user_id -> (expires at, post ids newest first)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._timelines.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._timelines[user_id]
+                return None
+            self._timelines.move_to_end(user_id)
+            return list(entry[1])
+
+    def set(self, user_id, post_ids):
+        with self._lock:
+            self._timelines[user_id] = (time.monotonic() + self.ttl, list(post_ids))
+            self._timelines.move_to_end(user_id)
+            while len(self._timelines) > self.max_users:
+                self._timelines.popitem(last=False)
+
+    def push(self, user_ids, post_id, max_length):
+        # Only timelines already built; the rest are rebuilt when next read.
+        # A timeline built after the post committed may already hold it.
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._timelines.get(user_id)
+                if entry is not None and not (entry[1] and entry[1][0] >= post_id):
+                    entry[1].insert(0, post_id)
+                    del entry[1][max_length + 1:]
+
+    def delete(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._timelines.pop(user_id, None)
+
+
+class RedisStorage:
+    """Timelines shared by every worker, one capped Redis list per user."""
+
+    def __init__(self, url, prefix, ttl):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, user_id):
+        return f'{self.prefix}{user_id}'
+
+    def get(self, user_id):
+        timeline = self.client.lrange(self._key(user_id), 0, -1)
+        return [int(post_id) for post_id in timeline] if timeline else None
+
+    def set(self, user_id, post_ids):
+        key = self._key(user_id)
+        with self.client.pipeline() as pipe:
+            pipe.delete(key)
+            pipe.rpush(key, *post_ids)
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+
+    def push(self, user_ids, post_id, max_length):
+        # LPUSHX skips users whose timeline isn't built (or has expired)
+        with self.client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                key = self._key(user_id)
+                pipe.lpushx(key, post_id)
+                pipe.ltrim(key, 0, max_length)
+            pipe.execute()
+
+    def delete(self, user_ids):
+        if user_ids:
+            self.client.delete(*(self._key(user_id) for user_id in user_ids))
+
+
+def _pulled_key(user_id):
+    return f'feed:pulled:{user_id}'
+
+
+class Timelines:
+    """Per-user home timelines materialized on write.
+
+    A new post's id is pushed onto the author's and each follower's capped
+    timeline, so reading a feed is one storage lookup plus hydrating the
+    page. Authors with ``TIMELINE_FANOUT_LIMIT`` or more followers are not
+    pushed; their posts are merged in when a follower reads. Timelines are
+    built from the database on first read and dropped when the user follows
+    or unfollows someone. ``TIMELINE_STORAGE`` is ``'memory'`` (per process,
+    rebuilt after ``TIMELINE_MEMORY_TTL`` seconds) or ``'redis'`` (shared,
+    at ``TIMELINE_REDIS_URL``).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TIMELINE_STORAGE', 'memory')
+        app.config.setdefault('TIMELINE_REDIS_URL', app.config.get('REDIS_URL'))
+        app.config.setdefault('TIMELINE_MAX_LENGTH', 800)
+        app.config.setdefault('TIMELINE_MAX_USERS', 10000)
+        app.config.setdefault('TIMELINE_TTL', 86400)
+        app.config.setdefault('TIMELINE_MEMORY_TTL', 60)
+        app.config.setdefault('TIMELINE_FANOUT_LIMIT', 10000)
+        if app.config['TIMELINE_STORAGE'] == 'redis':
+            storage = RedisStorage(app.config['TIMELINE_REDIS_URL'],
+                                   app.config.get('CACHE_KEY_PREFIX', '') + 'timeline:',
+                                   app.config['TIMELINE_TTL'])
+        else:
+            storage = MemoryStorage(app.config['TIMELINE_MAX_USERS'],
+                                    app.config['TIMELINE_MEMORY_TTL'])
+        app.extensions['timelines'] = storage
+
+    @property
+    def _storage(self):
+        return current_app.extensions['timelines']
+
+    def fan_out(self, post):
+        """Push a committed post onto its author's and followers' timelines."""
+        config = current_app.config
+        follower_count = db.session.scalar(
+            select(User.follower_count).where(User.id == post.user_id))
+        user_ids = [post.user_id]
+        if follower_count < config['TIMELINE_FANOUT_LIMIT']:
+            user_ids.extend(db.session.scalars(
+                select(Follow.follower_id).where(Follow.followed_id == post.user_id)
+            ))
+        self._storage.push(user_ids, post.id, config['TIMELINE_MAX_LENGTH'])
+
+    def following_changed(self, user_id):
+        self._storage.delete([user_id])
+        cache.delete(_pulled_key(user_id))
+
+    def _pulled_authors(self, user_id):
+        # Followed authors too big to fan out to; cached briefly, since an
+        # author crossing the limit only moves their posts between paths
+        authors = cache.get(_pulled_key(user_id))
+        if authors is None:
+            with use_primary(db.session):
+                authors = list(db.session.scalars(
+                    select(Follow.followed_id)
+                    .join(User, User.id == Follow.followed_id)
+                    .where(Follow.follower_id == user_id,
+                           User.follower_count >= current_app.config['TIMELINE_FANOUT_LIMIT'])
+                ))
+            cache.set(_pulled_key(user_id), authors)
+        return authors
+
+    def _query(self, user_id, before, limit):
+        # The feed straight from the database, minus pulled authors
+        pushed = select(Follow.followed_id)\
+            .join(User, User.id == Follow.followed_id)\
+            .where(Follow.follower_id == user_id,
+                   User.follower_count < current_app.config['TIMELINE_FANOUT_LIMIT'])
+        query = select(Post.id).where((Post.user_id == user_id) | Post.user_id.in_(pushed))
+        if before is not None:
+            query = query.where(Post.id < before)
+        return list(db.session.scalars(query.order_by(Post.id.desc()).limit(limit)))
+
+    def _build(self, user_id):
+        max_length = current_app.config['TIMELINE_MAX_LENGTH']
+        # Stored timelines are built from the primary; a lagging replica
+        # would leave recent posts out until the next rebuild
+        with use_primary(db.session):
+            post_ids = self._query(user_id, None, max_length + 1)
+        if len(post_ids) <= max_length:
+            post_ids.append(COMPLETE)
+        else:
+            del post_ids[max_length:]
+        self._storage.set(user_id, post_ids)
+        return post_ids
+
+    def page(self, user_id, before=None, limit=20):
+        """Ids of up to ``limit + 1`` posts in ``user_id``'s feed, newest first.
+
+        Only posts older than ``before`` (a post id) are returned; the extra
+        id tells the caller whether another page exists.
+        """
+        timeline = self._storage.get(user_id)
+        if timeline is None:
+            timeline = self._build(user_id)
+        complete = bool(timeline) and timeline[-1] == COMPLETE
+        if complete:
+            timeline.pop()
+        # A set: the post a concurrent build already picked up can be pushed again
+        post_ids = sorted({post_id for post_id in timeline
+                           if before is None or post_id < before}, reverse=True)[:limit + 1]
+
+        if not complete and len(post_ids) <= limit:
+            # Paged past the end of a trimmed timeline
+            floor = min(filter(None, (before, timeline[-1] if timeline else None)), default=None)
+            post_ids.extend(self._query(user_id, floor, limit + 1 - len(post_ids)))
+
+        pulled = self._pulled_authors(user_id)
+        if pulled:
+            query = select(Post.id).where(Post.user_id.in_(pulled))
+            if before is not None:
+                query = query.where(Post.id < before)
+            post_ids = sorted(set(post_ids).union(db.session.scalars(
+                query.order_by(Post.id.desc()).limit(limit + 1)
+            )), reverse=True)[:limit + 1]
+        return post_ids
+
+
+timelines = Timelines()
@@ -0,0 +1,184 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
+from flask import current_app, g, has_app_context
+
+from sqlalchemy import event, inspect
+
+from seagro import cache, db, login_manager
+from seagro.models.user import User
+
+HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b'=')
+
+# Identity carried in access tokens so requests can be served without a
+# user lookup; a subset of User.CACHED_COLUMNS
+TOKEN_COLUMNS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_admin')
+
+
+class TokenError(Exception):
+    pass
+
+
+class TokenRevoked(TokenError):
+    def __init__(self, claims):
+        super().__init__('Token revoked')
+        self.claims = claims
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+
+def _sign(message):
+    key = current_app.config['JWT_SECRET_KEY'] or current_app.config['SECRET_KEY']
+    return hmac.new(key.encode(), message, hashlib.sha256).digest()
+
+
+def encode(claims):
+    message = HEADER + b'.' + _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return (message + b'.' + _b64encode(_sign(message))).decode()
+
+
+def decode(token, kind):
+    """Verify a token's signature, expiry, kind and revocation; returns its claims."""
+    try:
+        header, payload, signature = token.encode().split(b'.')
+        valid = hmac.compare_digest(_b64decode(signature), _sign(header + b'.' + payload))
+        claims = json.loads(_b64decode(payload)) if valid and header == HEADER else None
+    except (ValueError, UnicodeError):
+        claims = None
+    if not isinstance(claims, dict) or claims.get('typ') != kind:
+        raise TokenError('Invalid token')
+    if claims['exp'] <= time.time():
+        raise TokenError('Token expired')
+    if _is_revoked(claims):
+        raise TokenRevoked(claims)
+    return claims
+
+
+# Revocation lives in the cache: one key per revoked token id plus a
+# per-user cut-off, each expiring with the tokens it covers.
+
+def _revoked_key(jti):
+    return f'revoked:{jti}'
+
+
+def _cutoff_key(user_id):
+    return f'revoked-before:{user_id}'
+
+
+def _is_revoked(claims):
+    revoked, cutoff = cache.get_many(_revoked_key(claims['jti']), _cutoff_key(claims['sub']))
+    return revoked is not None or (cutoff is not None and claims['iat'] <= cutoff)
+
+
+def _remaining(claims):
+    return int(claims['exp'] - time.time()) + 1
+
+
+def revoke(claims):
+    remaining = _remaining(claims)
+    if remaining > 0:
+        cache.set(_revoked_key(claims['jti']), True, timeout=remaining)
+
+
+def _use_once(claims):
+    # add() only succeeds for the first caller, so of two concurrent uses
+    # of the same token exactly one gets through
+    return cache.add(_revoked_key(claims['jti']), True, timeout=max(_remaining(claims), 1))
+
+
+def revoke_user(user_id):
+    """Revoke every token issued to ``user_id`` so far."""
+    cache.set(_cutoff_key(user_id), time.time(),
+              timeout=current_app.config['JWT_REFRESH_TOKEN_EXPIRES'] + 1)
+
+
+def _claims(user, kind, lifetime):
+    now = time.time()
+    return {'sub': user.id, 'typ': kind, 'jti': secrets.token_urlsafe(12),
+            'iat': now, 'exp': int(now + lifetime)}
+
+
+def issue_tokens(user):
+    config = current_app.config
+    access = _claims(user, 'access', config['JWT_ACCESS_TOKEN_EXPIRES'])
+    access['usr'] = {name: getattr(user, name) for name in TOKEN_COLUMNS}
+    refresh = _claims(user, 'refresh', config['JWT_REFRESH_TOKEN_EXPIRES'])
+    return {
+        'access_token': encode(access),
+        'refresh_token': encode(refresh),
+        'token_type': 'Bearer',
+        'expires_in': config['JWT_ACCESS_TOKEN_EXPIRES']
+    }
+
+
+def refresh_tokens(token):
+    """Swap a refresh token for a new pair.
+
+    Each refresh token works once; presenting a used one again revokes
+    everything issued to its user, since one of the two copies is stolen.
+    """
+    try:
+        claims = decode(token, 'refresh')
+    except TokenRevoked as exc:
+        revoke_user(exc.claims['sub'])
+        raise
+    if not _use_once(claims):
+        revoke_user(claims['sub'])
+        raise TokenRevoked(claims)
+    user = db.session.get(User, claims['sub'])
+    if user is None or not user.is_active:
+        raise TokenError('Invalid token')
+    return issue_tokens(user)
+
+
+@login_manager.request_loader
+def load_user_from_token(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    try:
+        claims = decode(token.strip(), 'access')
+    except TokenError:
+        return None
+    if not claims['usr'].get('is_active', True):
+        return None
+    g.access_token = claims
+    return User.from_cache(claims['usr'])
+
+
+@event.listens_for(User, 'after_update')
+def _revoke_deactivated(mapper, connection, target):
+    # Tokens carry is_active from when they were issued; end them at once
+    history = inspect(target).attrs.is_active.history
+    if history.added and not history.added[0] and has_app_context():
+        revoke_user(target.id)
+
+
+class TokenAuth:
+    """Signed bearer tokens (HS256 JWTs) issued alongside cookie sessions.
+
+    Access tokens carry the user's identity and are checked with an HMAC
+    and a cache lookup for revocation, never the database.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JWT_SECRET_KEY', None)
+        app.config.setdefault('JWT_ACCESS_TOKEN_EXPIRES', 3600)
+        app.config.setdefault('JWT_REFRESH_TOKEN_EXPIRES', 14400)
+
+
+token_auth = TokenAuth()
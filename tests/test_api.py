@@ -1,15 +1,73 @@
+import csv
+import io
+import json
+import os
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import time
 import unittest
-from seagro import create_app, db
-from seagro.models.user import User
+from unittest import mock
+from datetime import datetime
+from config import TestingConfig
+from seagro import cache, create_app, db, init_extension
+from seagro.api.job_import import IMPORT_LOCK_KEY
+from seagro.database import SchemaOutOfDate, migration_heads, use_primary
+from seagro.models.user import User, load_user
 from seagro.models.job import Job, JobApplication
+from seagro.models.course import Course, CourseEnrollment
+from seagro.models.media import MediaUpload
+from seagro.models.post import Post
+import flask
 import flask_login
+from werkzeug.security import generate_password_hash
+from seagro.hashing import password_hasher
+from seagro.mailqueue import deliver
+from seagro.models.mail import OutboundEmail
+from seagro.notifications import notifier
+from seagro.progress import progress_buffer
+from seagro.search import job_search
+from seagro.querycount import QueryBudgetExceeded, count_queries, query_budget
+from seagro.timelines import timelines
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of an SMTP server to accept mail on localhost."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPStandInHandler)
+        self.connections = 0
+        self.messages = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.connections += 1
+        self.wfile.write(b'220 stand-in\r\n')
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command == b'DATA':
+                self.wfile.write(b'354 end with .\r\n')
+                lines = []
+                for data in self.rfile:
+                    if data == b'.\r\n':
+                        break
+                    lines.append(data)
+                self.server.messages.append(b''.join(lines))
+            elif command == b'QUIT':
+                self.wfile.write(b'221 bye\r\n')
+                return
+            self.wfile.write(b'250 ok\r\n')
 
 class TestAPI(unittest.TestCase):
     def setUp(self):
-        self.app = create_app()
-        self.app.config['TESTING'] = True
-        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app = create_app(TestingConfig)
         self.client = self.app.test_client()
         self.app_context = self.app.app_context()
         self.app_context.push()
@@ -38,6 +96,15 @@ class TestAPI(unittest.TestCase):
         )
         db.session.add(self.job)
         db.session.commit()
+        
+        # Create a test course
+        self.course = Course(
+            title='Test Course',
+            description='Test Description',
+            content='Lesson one. Caf\u00e9 lesson two.'
+        )
+        db.session.add(self.course)
+        db.session.commit()
     
     def tearDown(self):
         db.session.remove()
@@ -62,6 +129,234 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(len(data['jobs']), 1)
         self.assertEqual(data['total'], 1)
     
+    def test_get_jobs_cursor(self):
+        for i in range(4):
+            db.session.add(Job(
+                title=f'Job {i}',
+                company='Test Company',
+                description='Test Description',
+                author_id=self.user.id
+            ))
+        db.session.commit()
+        
+        seen = []
+        response = self.client.get('/api/jobs?cursor=&per_page=2&include_total=1')
+        data = response.get_json()
+        self.assertEqual(data['total'], 5)
+        seen.extend(job['id'] for job in data['jobs'])
+        while data['next_cursor']:
+            response = self.client.get(f'/api/jobs?cursor={data["next_cursor"]}&per_page=2')
+            self.assertEqual(response.status_code, 200)
+            data = response.get_json()
+            self.assertNotIn('total', data)
+            seen.extend(job['id'] for job in data['jobs'])
+        self.assertEqual(sorted(seen), sorted(job.id for job in Job.query.all()))
+        
+        response = self.client.get('/api/jobs?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+    
+    def _assert_search_ranking(self):
+        login_response = self.login()
+        self.assertEqual(login_response.status_code, 200)
+        for title, company, location in [
+            ('Senior Python Developer', 'Tech Corp', 'Remote'),
+            ('Frontend Developer', 'Web Solutions', 'Remote'),
+            ('Python Data Engineer', 'Web Solutions', 'Berlin'),
+        ]:
+            response = self.client.post('/api/jobs', json={
+                'title': title,
+                'company': company,
+                'location': location,
+                'description': 'We build things'
+            })
+            self.assertEqual(response.status_code, 201)
+        
+        response = self.client.get('/api/jobs/search?q=python')
+        self.assertEqual(response.status_code, 200)
+        titles = [job['title'] for job in response.get_json()['jobs']]
+        self.assertCountEqual(titles, ['Senior Python Developer', 'Python Data Engineer'])
+        
+        response = self.client.get('/api/jobs/search?q=developer&location=remote&company=web solutions')
+        titles = [job['title'] for job in response.get_json()['jobs']]
+        self.assertEqual(titles, ['Frontend Developer'])
+        
+        response = self.client.get('/api/jobs/search?q=cobol')
+        self.assertEqual(response.get_json()['jobs'], [])
+        
+        # Terms match as prefixes on every backend
+        response = self.client.get('/api/jobs/search?q=pyth engin')
+        titles = [job['title'] for job in response.get_json()['jobs']]
+        self.assertEqual(titles, ['Python Data Engineer'])
+        
+        response = self.client.get('/api/jobs/search')
+        self.assertEqual(response.status_code, 400)
+    
+    def _add_job_elsewhere(self, title):
+        # As if through another worker: in the database, not in this index
+        db.session.execute(db.insert(Job), [{
+            'title': title, 'company': 'Elsewhere', 'description': 'Old systems',
+            'author_id': self.user.id
+        }])
+    
+    def test_search_jobs(self):
+        self._assert_search_ranking()
+        
+        # Indexing joins the caller's transaction
+        self._add_job_elsewhere('COBOL Developer')
+        with mock.patch.object(db.session, 'commit') as commit:
+            job_search.index([Job.query.filter_by(title='COBOL Developer').one()])
+        commit.assert_not_called()
+        db.session.rollback()
+        self.assertEqual(self.client.get('/api/jobs/search?q=cobol').get_json()['jobs'], [])
+    
+    def test_search_jobs_memory_backend(self):
+        self.app.config['SEARCH_BACKEND'] = 'memory'
+        self._assert_search_ranking()
+        
+        self._add_job_elsewhere('COBOL Developer')
+        db.session.commit()
+        self.assertEqual(self.client.get('/api/jobs/search?q=cobol').get_json()['jobs'], [])
+        later = time.monotonic() + self.app.config['SEARCH_SYNC_INTERVAL']
+        with mock.patch('seagro.search.time.monotonic', return_value=later):
+            response = self.client.get('/api/jobs/search?q=cobol')
+        self.assertEqual([job['title'] for job in response.get_json()['jobs']], ['COBOL Developer'])
+    
+    def test_load_user_uses_cached_identity(self):
+        user_id = self.user.id
+        self.assertEqual(load_user(str(user_id)).first_name, 'Test')
+        
+        # A write that bypasses the ORM is invisible to the cached identity
+        db.session.execute(
+            db.text("UPDATE user SET first_name = 'Raw' WHERE id = :id"),
+            {'id': user_id}
+        )
+        db.session.commit()
+        db.session.expunge_all()
+        user = load_user(str(user_id))
+        self.assertEqual(user.first_name, 'Test')
+        
+        # ORM updates evict it
+        user.first_name = 'Updated'
+        db.session.commit()
+        db.session.expunge_all()
+        self.assertEqual(load_user(str(user_id)).first_name, 'Updated')
+    
+    def test_login_rehashes_outdated_password_hash(self):
+        self.user.password_hash = generate_password_hash('password123', method='pbkdf2:sha256:1000')
+        db.session.commit()
+        
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.user.password_needs_rehash())
+        self.assertTrue(self.user.check_password('password123'))
+    
+    def test_login_rejected_when_hasher_saturated(self):
+        self.app.config['PASSWORD_HASH_EXECUTOR'] = 'thread'
+        password_hasher.init_app(self.app)
+        slots = self.app.extensions['password_hasher'].slots
+        held = 0
+        while slots.acquire(blocking=False):
+            held += 1
+        try:
+            response = self.client.post('/auth/login', json={
+                'email': 'test@example.com',
+                'password': 'password123'
+            })
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response.headers)
+        finally:
+            for _ in range(held):
+                slots.release()
+        
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+    
+    def test_login_hash_timeout(self):
+        self.app.config.update(PASSWORD_HASH_EXECUTOR='thread', PASSWORD_HASH_TIMEOUT=0.01)
+        password_hasher.init_app(self.app)
+        started = threading.Event()
+        release = threading.Event()
+        
+        def slow_verify(pwhash, password):
+            started.set()
+            release.wait(5)
+            return True
+        
+        try:
+            with mock.patch('seagro.hashing._verify', slow_verify):
+                response = self.client.post('/auth/login', json={
+                    'email': 'test@example.com',
+                    'password': 'password123'
+                })
+            self.assertTrue(started.is_set())
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('Retry-After', response.headers)
+        finally:
+            release.set()
+    
+    def test_job_list_response_cache(self):
+        response = self.client.get('/api/jobs?per_page=5&page=1')
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        etag = response.headers['ETag']
+        
+        # Argument order does not matter for the cache key
+        response = self.client.get('/api/jobs?page=1&per_page=5')
+        self.assertEqual(response.headers['X-Cache'], 'HIT')
+        
+        response = self.client.get('/api/jobs?page=1&per_page=5',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        
+        self.login()
+        self.client.post('/api/jobs', json={
+            'title': 'Another Job',
+            'company': 'Test Company',
+            'description': 'Test Description'
+        })
+        response = self.client.get('/api/jobs?page=1&per_page=5',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['total'], 2)
+    
+    def test_list_endpoints_stay_within_query_budget(self):
+        for i in range(5):
+            applicant = User(username=f'applicant{i}', email=f'applicant{i}@example.com')
+            db.session.add(applicant)
+            db.session.flush()
+            db.session.add(JobApplication(job_id=self.job.id, applicant_id=applicant.id))
+            db.session.add(Job(
+                title=f'Job {i}',
+                company='Test Company',
+                description='Test Description',
+                author_id=applicant.id
+            ))
+        db.session.commit()
+        job_id, user_id = self.job.id, self.user.id
+        db.session.expunge_all()
+        self.user = db.session.get(User, user_id)
+        
+        self.login()
+        response = self.client.get(f'/api/jobs/{job_id}/applications')
+        self.assertEqual(response.status_code, 200)
+        usernames = {app['applicant']['username'] for app in response.get_json()['applications']}
+        self.assertEqual(usernames, {f'applicant{i}' for i in range(5)})
+        
+        response = self.client.get('/api/jobs?per_page=20')
+        self.assertEqual(len(response.get_json()['jobs']), 6)
+        response = self.client.get(f'/api/jobs/{job_id}')
+        self.assertEqual(response.get_json()['author']['username'], 'test_user')
+    
+    def test_query_budget_exceeded(self):
+        @query_budget(1)
+        def chatty():
+            User.query.all()
+            Job.query.all()
+            return 'ok'
+        self.app.add_url_rule('/_chatty', view_func=chatty)
+        
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/_chatty')
+    
     def test_create_job(self):
         # First, login
         login_response = self.login()
@@ -87,6 +382,47 @@ class TestAPI(unittest.TestCase):
         job = response.get_json()
         self.assertEqual(job['title'], job_data['title'])
     
+    def test_bulk_import_jobs(self):
+        self.login()
+        rows = [
+            {'title': 'Bulk Job 1', 'company': 'Feed Co', 'location': 'Remote', 'description': 'One'},
+            {'title': 'Bulk Job 2', 'company': 'Feed Co', 'description': 'Two'},
+            {'title': 'Bulk Job 1', 'company': 'Feed Co', 'location': 'Remote', 'description': 'Dup'},
+            {'title': 'Test Job', 'company': 'Test Company', 'location': 'Test Location', 'description': 'Existing'},
+            {'company': 'Feed Co', 'description': 'No title'},
+        ]
+        response = self.client.post('/api/jobs/bulk?batch_size=2', json=rows)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual((data['created'], data['duplicates'], data['invalid']), (2, 2, 1))
+        self.assertEqual([r['status'] for r in data['results']],
+                         ['created', 'created', 'duplicate', 'duplicate', 'invalid'])
+        created = db.session.get(Job, data['results'][1]['id'])
+        self.assertEqual(created.title, 'Bulk Job 2')
+        self.assertEqual(created.author_id, self.user.id)
+        
+        # NDJSON bodies are read line by line; jobs without a location dedupe too
+        body = '\n'.join([
+            '{"title": "Bulk Job 2", "company": "Feed Co", "description": "Two"}',
+            'not json',
+            '{"title": "Bulk Job 3", "company": "Feed Co", "description": "Three"}',
+        ])
+        response = self.client.post('/api/jobs/bulk', data=body,
+                                    content_type='application/x-ndjson')
+        data = response.get_json()
+        self.assertEqual([r['status'] for r in data['results']],
+                         ['duplicate', 'invalid', 'created'])
+        
+        response = self.client.get('/api/jobs/search?q=bulk')
+        self.assertEqual(len(response.get_json()['jobs']), 3)
+        
+        # Imports run one at a time
+        cache.set(IMPORT_LOCK_KEY, 0)
+        response = self.client.post('/api/jobs/bulk', data=body,
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 409)
+        cache.delete(IMPORT_LOCK_KEY)
+    
     def test_apply_for_job(self):
         # First, login
         login_response = self.login()
@@ -109,6 +445,14 @@ class TestAPI(unittest.TestCase):
             self.assertEqual(application.job_id, self.job.id)
             self.assertEqual(application.applicant_id, self.user.id)
     
+    def test_apply_for_job_twice(self):
+        self.login()
+        response = self.client.post(f'/api/jobs/{self.job.id}/apply', json={'resume': 'a.pdf'})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(f'/api/jobs/{self.job.id}/apply', json={'resume': 'b.pdf'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(JobApplication.query.filter_by(job_id=self.job.id).count(), 1)
+    
     def test_get_job_applications(self):
         # First, login
         login_response = self.login()
@@ -132,6 +476,668 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(len(data['applications']), 1)
         self.assertEqual(data['applications'][0]['job_id'], self.job.id)
 
+    def test_stream_job_applications(self):
+        self.login()
+        for i, status in enumerate(('pending', 'accepted', 'pending')):
+            applicant = User(username=f'applicant{i}', email=f'applicant{i}@example.com')
+            db.session.add(applicant)
+            db.session.flush()
+            db.session.add(JobApplication(
+                job_id=self.job.id,
+                applicant_id=applicant.id,
+                cover_letter='Line one\nline "two"',
+                status=status
+            ))
+        db.session.commit()
+        
+        response = self.client.get(f'/api/jobs/{self.job.id}/applications?format=ndjson&status=pending')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([r['status'] for r in records], ['pending', 'pending'])
+        self.assertEqual(records[0]['applicant_username'], 'applicant0')
+        
+        response = self.client.get(f'/api/jobs/{self.job.id}/applications?format=csv')
+        self.assertEqual(response.mimetype, 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['cover_letter'], 'Line one\nline "two"')
+        
+        response = self.client.get(f'/api/jobs/{self.job.id}/applications?status=accepted')
+        self.assertEqual(len(response.get_json()['applications']), 1)
+        response = self.client.get(f'/api/jobs/{self.job.id}/applications?status=hired')
+        self.assertEqual(response.status_code, 400)
+
+    def test_metrics_and_server_timing(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            class MetricsConfig(TestingConfig):
+                METRICS_ENABLED = True
+                METRICS_TOKEN = 'scrape-me'
+                PROFILE_SAMPLE_RATE = 1.0
+                PROFILE_SLOW_REQUEST_MS = 0
+                PROFILE_DIR = profile_dir
+                PROFILE_MAX_FILES = 2
+            
+            app = create_app(MetricsConfig)
+            with app.app_context():
+                db.create_all()
+            client = app.test_client()
+            for _ in range(3):
+                response = client.get('/api/jobs')
+                self.assertEqual(response.status_code, 200)
+            self.assertRegex(response.headers['Server-Timing'],
+                             r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", json;dur=[\d.]+')
+            
+            self.assertEqual(client.get('/metrics').status_code, 403)
+            self.assertEqual(client.get('/metrics', headers={
+                'Authorization': 'Bearer wrong'}).status_code, 403)
+            body = client.get('/metrics', headers={
+                'Authorization': 'Bearer scrape-me'}).get_data(as_text=True)
+            self.assertIn('seagro_requests_total{endpoint="api.get_jobs",method="GET",status="200"} 3', body)
+            self.assertIn('seagro_request_duration_seconds_count{endpoint="api.get_jobs",method="GET"} 3', body)
+            self.assertIn('seagro_sql_queries_total{endpoint="api.get_jobs",method="GET"}', body)
+            self.assertEqual(len(os.listdir(profile_dir)), 2)
+
+    def test_engine_profile_and_replica_routing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            class ReplicaConfig(TestingConfig):
+                SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'primary.db')
+                DATABASE_REPLICA_URL = 'sqlite:///' + os.path.join(tmp, 'replica.db')
+                METRICS_ENABLED = True
+                METRICS_TOKEN = 'scrape-me'
+            
+            app = create_app(ReplicaConfig)
+            with app.app_context():
+                self.assertEqual(app.config['DB_ENGINE_PROFILE'], 'sqlite-wal')
+                self.assertEqual(db.session.execute(db.text('PRAGMA journal_mode')).scalar(), 'wal')
+                self.assertEqual(db.session.execute(db.text('PRAGMA busy_timeout')).scalar(),
+                                 app.config['DB_POOL_TIMEOUT'] * 1000)
+                primary, replica = db.engine, app.extensions['db_replica']
+            
+            with app.test_request_context('/api/jobs', method='GET'):
+                self.assertIs(db.session.get_bind(Job), replica)
+                with use_primary(db.session):
+                    self.assertIs(db.session.get_bind(Job), primary)
+                self.assertIs(db.session.get_bind(Job, clause=db.select(Job.id)), replica)
+                # A write in a GET goes to the primary, and so does what follows
+                self.assertIs(db.session.get_bind(Job, clause=db.update(Job)), primary)
+                self.assertIs(db.session.get_bind(Job), primary)
+            with app.test_request_context('/api/jobs', method='GET'):
+                self.assertIs(db.session.get_bind(Job), replica)
+                db.session.info['use_primary'] = True
+                self.assertIs(db.session.get_bind(Job), primary)
+            with app.test_request_context('/api/jobs', method='POST'):
+                self.assertIs(db.session.get_bind(Job), primary)
+            
+            body = app.test_client().get('/metrics', headers={
+                'Authorization': 'Bearer scrape-me'}).get_data(as_text=True)
+            self.assertIn('seagro_db_pool_checkouts_total{bind="default"}', body)
+            self.assertIn('seagro_db_pool_checked_out{bind="replica"}', body)
+            with app.app_context():
+                db.engine.dispose()
+            replica.dispose()
+
+    def test_cached_views_read_from_primary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            class ReplicaConfig(TestingConfig):
+                SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'primary.db')
+                DATABASE_REPLICA_URL = 'sqlite:///' + os.path.join(tmp, 'replica.db')
+                RESPONSE_CACHE_ENABLED = True
+            
+            app = create_app(ReplicaConfig)
+            with app.app_context():
+                db.create_all()  # on the primary only
+            replica = app.extensions['db_replica']
+            replica_reads = []
+            db.event.listen(replica, 'before_cursor_execute',
+                            lambda *args: replica_reads.append(args[2]))
+            
+            client = app.test_client()
+            response = client.get('/api/jobs?cursor=&include_total=1')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['X-Cache'], 'MISS')
+            self.assertEqual(response.get_json()['total'], 0)
+            self.assertEqual(replica_reads, [])
+            with app.app_context():
+                db.engine.dispose()
+            replica.dispose()
+    
+    def test_fast_boot_defers_extensions_and_checks_schema(self):
+        self.assertNotIn('socketio', self.app.extensions)
+        self.assertNotIn('mail', self.app.extensions)
+        socketio = init_extension('socketio', self.app)
+        self.assertIs(self.app.extensions['socketio'], socketio)
+        self.assertIs(init_extension('socketio', self.app), socketio)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            class StrictConfig(TestingConfig):
+                SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'app.db')
+                SCHEMA_CHECK = 'error'
+            
+            with self.assertRaises(SchemaOutOfDate):
+                create_app(StrictConfig)
+            
+            heads = migration_heads(TestingConfig.MIGRATIONS_DIR)
+            self.assertEqual(len(heads), 1)
+            # A different database: the check result is cached per URL
+            StrictConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'migrated.db')
+            engine = db.create_engine(StrictConfig.SQLALCHEMY_DATABASE_URI)
+            with engine.begin() as connection:
+                connection.execute(db.text('CREATE TABLE alembic_version (version_num VARCHAR(32))'))
+                connection.execute(db.text('INSERT INTO alembic_version VALUES (:v)'),
+                                   {'v': heads.pop()})
+            engine.dispose()
+            app = create_app(StrictConfig)
+            with app.app_context():
+                db.engine.dispose()
+
+    def test_application_notifications(self):
+        self.login()
+        socket = init_extension('socketio', self.app).test_client(
+            self.app, flask_test_client=self.client)
+        self.assertTrue(socket.is_connected())
+        
+        response = self.client.post(f'/api/jobs/{self.job.id}/apply', json={'resume': 'a.pdf'})
+        application_id = response.get_json()['id']
+        # A second event for the same job inside the window merges into the first
+        notifier.publish(self.user.id, 'application.received', self.job.id,
+                         job_id=self.job.id, application_ids=[999])
+        notifier.flush()
+        received = socket.get_received()
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['name'], 'notifications')
+        self.assertEqual(received[0]['args'][0]['events'], [{
+            'type': 'application.received',
+            'job_id': self.job.id,
+            'application_ids': [application_id, 999]
+        }])
+        
+        url = f'/api/jobs/{self.job.id}/applications/{application_id}'
+        self.assertEqual(self.client.patch(url, json={'status': 'hired'}).status_code, 400)
+        response = self.client.patch(url, json={'status': 'accepted'})
+        self.assertEqual(response.get_json()['status'], 'accepted')
+        notifier.flush()
+        events = socket.get_received()[0]['args'][0]['events']
+        self.assertEqual(events[0]['type'], 'application.status')
+        self.assertEqual(events[0]['status'], 'accepted')
+        
+        # The test's app context outlives requests, so drop the cached user
+        flask.g.pop('_login_user', None)
+        anonymous = init_extension('socketio', self.app).test_client(self.app)
+        self.assertFalse(anonymous.is_connected())
+
+    def test_mail_queue_batches_and_retries(self):
+        self.login()
+        response = self.client.post('/auth/register', json={
+            'username': 'new_user', 'email': 'new@example.com', 'password': 'secret'
+        })
+        self.assertEqual(response.status_code, 201)
+        self.client.post(f'/api/jobs/{self.job.id}/apply', json={'resume': 'a.pdf'})
+        self.assertEqual(OutboundEmail.query.filter_by(status='pending').count(), 2)
+        
+        # Nothing listens here: the batch is rescheduled with backoff
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        self.app.config.update(MAIL_SUPPRESS_SEND=False, MAIL_SERVER='127.0.0.1',
+                               MAIL_PORT=closed.getsockname()[1])
+        closed.close()
+        self.assertEqual(deliver(), 2)
+        emails = OutboundEmail.query.all()
+        self.assertEqual({e.status for e in emails}, {'pending'})
+        self.assertEqual({e.attempts for e in emails}, {1})
+        self.assertTrue(all(e.next_attempt_at > datetime.utcnow() for e in emails))
+        self.assertEqual(deliver(), 0)
+        
+        server = SMTPStandIn()
+        try:
+            self.app.extensions['mail'].port = server.server_address[1]
+            OutboundEmail.query.update({'next_attempt_at': datetime.utcnow()})
+            db.session.commit()
+            # The claim and the recorded results, however many emails
+            with count_queries() as queries:
+                self.assertEqual(deliver(), 2)
+            self.assertEqual(queries.count, 2)
+        finally:
+            server.close()
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(server.messages), 2)
+        messages = b''.join(server.messages)
+        self.assertIn(b'Subject: Welcome to Seagro', messages)
+        self.assertIn(b'Subject: New application for Test Job', messages)
+        self.assertEqual({e.status for e in OutboundEmail.query}, {'sent'})
+        self.assertEqual({e.attempts for e in OutboundEmail.query}, {2})
+        
+        # Left 'sending' by a worker that died on it: counted, then given up
+        crashed = OutboundEmail(recipient='x@example.com', subject='Boom', body='.',
+                                status='sending', next_attempt_at=datetime.utcnow(),
+                                attempts=self.app.config['MAIL_QUEUE_MAX_ATTEMPTS'])
+        db.session.add(crashed)
+        db.session.commit()
+        self.assertEqual(deliver(), 1)
+        db.session.refresh(crashed)
+        self.assertEqual((crashed.status, crashed.attempts),
+                         ('failed', self.app.config['MAIL_QUEUE_MAX_ATTEMPTS']))
+
+    def test_applicant_counter_and_reconcile(self):
+        self.login()
+        self.client.post(f'/api/jobs/{self.job.id}/apply', json={'resume': 'a.pdf'})
+        self.client.post(f'/api/jobs/{self.job.id}/apply', json={'resume': 'b.pdf'})
+        response = self.client.get('/api/jobs')
+        self.assertEqual(response.get_json()['jobs'][0]['applicant_count'], 1)
+        
+        course = Course(title='Course', description='About', content='Body')
+        db.session.add(course)
+        db.session.commit()
+        db.session.add(CourseEnrollment(user_id=self.user.id, course_id=course.id))
+        Job.query.update({'applicant_count': 7})
+        db.session.commit()
+        
+        result = self.app.test_cli_runner().invoke(args=['reconcile-counters'])
+        self.assertIn('job.applicant_count: repaired 1 rows', result.output)
+        self.assertIn('course.enrollment_count: repaired 1 rows', result.output)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Job, self.job.id).applicant_count, 1)
+        self.assertEqual(db.session.get(Course, course.id).enrollment_count, 1)
+
+    def test_serializers_encode_rows(self):
+        response = self.client.get(f'/api/jobs/{self.job.id}')
+        data = response.get_json()
+        self.assertEqual(data['author'], {'id': self.user.id, 'username': 'test_user'})
+        self.assertEqual(data['created_at'], self.job.created_at.isoformat())
+        self.assertEqual(self.client.get('/api/jobs/999').status_code, 404)
+        
+        # orjson (when installed) and the stdlib fallback agree
+        value = {'b': datetime(2024, 1, 2, 3, 4, 5), 'a': [1, 'x']}
+        expected = '{"a":[1,"x"],"b":"2024-01-02T03:04:05"}'
+        self.assertEqual(self.app.json.dumps(value), expected)
+        self.assertEqual(self.app.json.dumps(value, separators=(',', ':'), indent=None), expected)
+
+    def test_login_rate_limited_before_lookup(self):
+        self.app.config['RATELIMITS'] = {'login:ip': '10/minute', 'login:account': '2/minute'}
+        credentials = {'email': 'Test@example.com ', 'password': 'wrong'}
+        for _ in range(2):
+            self.assertEqual(self.client.post('/auth/login', json=credentials).status_code, 401)
+        with count_queries() as queries:
+            response = self.client.post('/auth/login', json=credentials)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(queries.count, 0)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        
+        # Another account from the same address still gets through
+        response = self.client.post('/auth/login', json={'email': 'other@example.com', 'password': 'x'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_bearer_tokens(self):
+        tokens = self.client.post('/auth/login', json={
+            'email': 'test@example.com', 'password': 'password123'
+        }).get_json()
+        self.assertEqual(tokens['token_type'], 'Bearer')
+        api = self.app.test_client()  # no session cookie
+        
+        def get_profile(access_token):
+            # The test's app context outlives requests, so drop the cached user
+            flask.g.pop('_login_user', None)
+            return api.get('/api/users/profile',
+                           headers={'Authorization': f'Bearer {access_token}'})
+        
+        with count_queries() as queries:
+            response = get_profile(tokens['access_token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['username'], 'test_user')
+        self.assertEqual(queries.count, 0)
+        self.assertEqual(get_profile(tokens['access_token'][:-2] + 'xx').status_code, 401)
+        self.assertEqual(get_profile(tokens['refresh_token']).status_code, 401)
+        
+        response = api.post('/auth/refresh', json={'refresh_token': tokens['refresh_token']})
+        self.assertEqual(response.status_code, 200)
+        fresh = response.get_json()
+        self.assertEqual(get_profile(fresh['access_token']).status_code, 200)
+        
+        # Replaying a used refresh token revokes everything issued so far
+        response = api.post('/auth/refresh', json={'refresh_token': tokens['refresh_token']})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(get_profile(fresh['access_token']).status_code, 401)
+
+    def test_inactive_accounts_lose_tokens(self):
+        tokens = self.client.post('/auth/login', json={
+            'email': 'test@example.com', 'password': 'password123'
+        }).get_json()
+        api = self.app.test_client()
+        headers = {'Authorization': f"Bearer {tokens['access_token']}"}
+        
+        user = db.session.get(User, self.user.id)
+        user.is_active = False
+        db.session.commit()
+        flask.g.pop('_login_user', None)
+        self.assertEqual(api.get('/api/users/profile', headers=headers).status_code, 401)
+        
+        response = api.post('/auth/login', json={
+            'email': 'test@example.com', 'password': 'password123'
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('access_token', response.get_json())
+    
+    def test_register_and_login_error_shapes(self):
+        def assert_error(response, status, message):
+            self.assertEqual(response.status_code, status)
+            # Both the 'error' and the legacy 'message' shape
+            self.assertEqual(response.get_json(), {'error': message, 'message': message})
+        
+        account = {'username': 'fresh', 'email': 'fresh@example.com', 'password': 'secret'}
+        with count_queries() as queries:
+            response = self.client.post('/auth/register', json=account)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['message'], 'User registered successfully')
+        selects = [s for s in queries.statements if s.lstrip().upper().startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        
+        assert_error(self.client.post('/auth/register', json=account),
+                     400, 'Email already registered')
+        assert_error(self.client.post('/auth/register', json=dict(account, email='other@example.com')),
+                     400, 'Username already taken')
+        assert_error(self.client.post('/auth/register', json={'email': 'x@example.com'}),
+                     400, 'Missing required fields')
+        assert_error(self.client.post('/auth/login', json={'email': 'fresh@example.com'}),
+                     400, 'Missing required fields')
+        assert_error(self.client.post('/auth/login', json=dict(account, password='wrong')),
+                     401, 'Invalid email or password')
+        
+        response = self.client.post('/auth/login', json=account)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['message'], 'Logged in successfully')
+        self.assertEqual(response.get_json()['user']['username'], 'fresh')
+
+    def test_bulk_application_status(self):
+        applications = []
+        for i in range(4):
+            applicant = User(username=f'applicant{i}', email=f'applicant{i}@example.com')
+            applicant.set_password('password123')
+            db.session.add(applicant)
+            db.session.flush()
+            applications.append(JobApplication(job_id=self.job.id, applicant_id=applicant.id))
+        db.session.add_all(applications)
+        db.session.commit()
+        ids = [application.id for application in applications]
+        url = f'/api/jobs/{self.job.id}/applications'
+        self.login()
+        
+        self.assertEqual(self.client.patch(url, json={'status': 'accepted'}).status_code, 400)
+        self.assertEqual(self.client.patch(url, json={
+            'status': 'accepted', 'filter': {'resume': 'x'}}).status_code, 400)
+        
+        self.assertEqual(self.client.patch(url, json={
+            'status': 'accepted', 'ids': [True]}).status_code, 400)
+        
+        with mock.patch.object(notifier, 'publish_many') as publish:
+            response = self.client.patch(url, json={'status': 'accepted', 'ids': ids[:2] + [999]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {
+            'status': 'accepted', 'updated': 2, 'application_ids': ids[:2], 'unchanged': 1
+        })
+        publish.assert_called_once()
+        self.assertEqual(sorted(event[2] for event in publish.call_args.args[0]), ids[:2])
+        
+        # Everything still pending is rejected; accepted ones are untouched
+        response = self.client.patch(url, json={'status': 'rejected',
+                                                'filter': {'status': 'pending'}})
+        self.assertEqual(response.get_json()['application_ids'], ids[2:])
+        statuses = dict(db.session.execute(
+            db.select(JobApplication.id, JobApplication.status)
+            .where(JobApplication.job_id == self.job.id)
+        ).all())
+        self.assertEqual(statuses, dict(zip(ids, ['accepted', 'accepted', 'rejected', 'rejected'])))
+        
+        # Only the job's author may change statuses
+        flask.g.pop('_login_user', None)
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(applications[0].applicant_id)
+        response = self.client.patch(url, json={'status': 'pending', 'ids': ids})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.patch('/api/jobs/999/applications',
+                                           json={'status': 'pending', 'ids': ids}).status_code, 404)
+    
+    def _login_as(self, user_id):
+        flask.g.pop('_login_user', None)
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+    
+    def test_feed_fan_out(self):
+        self.app.config['TIMELINE_MAX_LENGTH'] = 3
+        author = User(username='author', email='author@example.com')
+        author.set_password('password123')
+        db.session.add(author)
+        db.session.commit()
+        author_id, reader_id = author.id, self.user.id
+        
+        self._login_as(reader_id)
+        self.assertEqual(self.client.get('/api/feed').get_json(),
+                         {'posts': [], 'next_cursor': None})
+        self.assertEqual(self.client.post(f'/api/users/{author_id}/follow').status_code, 200)
+        self.assertEqual(self.client.post(f'/api/users/{author_id}/follow').status_code, 400)
+        self.assertEqual(db.session.get(User, author_id).follower_count, 1)
+        own = self.client.post('/api/posts', json={'content': 'Reader post'}).get_json()['id']
+        # Builds the (empty) timeline so the posts below are pushed onto it
+        self.assertEqual([p['id'] for p in self.client.get('/api/feed').get_json()['posts']], [own])
+        
+        self._login_as(author_id)
+        ids = [self.client.post('/api/posts', json={'content': f'Post {i}'}).get_json()['id']
+               for i in range(4)]
+        
+        # The newest three are read from the timeline, the rest from the database
+        self._login_as(reader_id)
+        with count_queries() as queries:
+            first = self.client.get('/api/feed?per_page=2').get_json()
+        self.assertEqual([post['id'] for post in first['posts']], ids[:1:-1])
+        self.assertEqual(first['posts'][0]['author']['username'], 'author')
+        self.assertEqual(queries.count, 0)
+        second = self.client.get(f"/api/feed?per_page=2&cursor={first['next_cursor']}").get_json()
+        self.assertEqual([post['id'] for post in second['posts']], ids[1::-1])
+        third = self.client.get(f"/api/feed?per_page=2&cursor={second['next_cursor']}").get_json()
+        self.assertEqual([post['id'] for post in third['posts']], [own])
+        self.assertIsNone(third['next_cursor'])
+        self.assertEqual(self.client.get('/api/feed?cursor=%%%').status_code, 400)
+        
+        # A fan-out that lands after a rebuild already holding the post
+        storage = self.app.extensions['timelines']
+        storage.delete([reader_id])
+        self.client.get('/api/feed')
+        timelines.fan_out(db.session.get(Post, ids[-1]))
+        feed = self.client.get('/api/feed?per_page=3').get_json()
+        self.assertEqual([post['id'] for post in feed['posts']], ids[:0:-1])
+        with mock.patch('seagro.timelines.time.monotonic',
+                        return_value=time.monotonic() + self.app.config['TIMELINE_MEMORY_TTL']):
+            self.assertIsNone(storage.get(reader_id))
+        
+        response = self.client.get(f'/api/users/{author_id}/posts?per_page=3').get_json()
+        self.assertEqual([post['id'] for post in response['posts']], ids[:0:-1])
+        
+        self.assertEqual(self.client.delete(f'/api/users/{author_id}/follow').status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/users/{author_id}/follow').status_code, 404)
+        self.assertEqual([p['id'] for p in self.client.get('/api/feed').get_json()['posts']], [own])
+    
+    def test_feed_pulls_popular_authors(self):
+        self.app.config['TIMELINE_FANOUT_LIMIT'] = 1
+        author = User(username='author', email='author@example.com')
+        author.set_password('password123')
+        db.session.add(author)
+        db.session.commit()
+        author_id, reader_id = author.id, self.user.id
+        
+        self._login_as(reader_id)
+        self.client.post(f'/api/users/{author_id}/follow')
+        self.client.get('/api/feed')
+        self._login_as(author_id)
+        post_id = self.client.post('/api/posts', json={'content': 'Hello'}).get_json()['id']
+        
+        # Not pushed (the author is at the limit) but merged in on read
+        self._login_as(reader_id)
+        self.assertEqual(self.app.extensions['timelines'].get(reader_id), [0])
+        posts = self.client.get('/api/feed').get_json()['posts']
+        self.assertEqual([post['id'] for post in posts], [post_id])
+    
+    def test_resumable_media_upload(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.app.extensions['media'].storage.root = media_root
+        self.login()
+        
+        self.assertEqual(self.client.post('/api/media/uploads', json={
+            'content_type': 'text/html'}).status_code, 400)
+        upload = self.client.post('/api/media/uploads', json={
+            'content_type': 'image/png', 'size': 11}).get_json()
+        base = f"/api/media/uploads/{upload['id']}"
+        # Unfinished uploads and unknown keys are never signed
+        self.assertEqual(self.client.get(f"/api/media/files/{upload['key']}").status_code, 404)
+        self.assertEqual(self.client.get('/api/media/files/.uploads/x').status_code, 404)
+        # Parts can't add up to more than the declared size
+        self.assertEqual(self.client.put(f'{base}/parts/1', data=b'x' * 12).status_code, 413)
+        
+        processed = []
+        hook = lambda storage, key, content_type: processed.append((key, content_type))
+        with mock.patch.dict('seagro.media.processing.PROCESSORS', {'image': [hook]}):
+            self.assertEqual(self.client.put(f'{base}/parts/2', data=b' world').status_code, 200)
+            # A dropped first attempt is retried; resuming lists what is stored
+            self.client.put(f'{base}/parts/1', data=b'HELLO')
+            self.client.put(f'{base}/parts/1', data=b'hello')
+            parts = self.client.get(base).get_json()['parts']
+            self.assertEqual([(p['part_number'], p['size']) for p in parts], [(1, 5), (2, 6)])
+            response = self.client.post(f'{base}/complete', json={'parts': [
+                {'part_number': 2, 'etag': parts[1]['etag']},
+                {'part_number': 1, 'etag': parts[0]['etag']}]})
+            self.assertEqual(response.status_code, 400)
+            # A part that got past the per-part check in parallel
+            self.app.extensions['media'].storage.upload_part(
+                upload['key'], db.session.get(MediaUpload, upload['id']).storage_upload_id,
+                3, io.BytesIO(b'!'), 1)
+            self.assertEqual(self.client.post(f'{base}/complete').status_code, 413)
+            response = self.client.post(f'{base}/complete', json={'parts': [
+                {'part_number': 1, 'etag': parts[0]['etag']},
+                {'part_number': 2, 'etag': parts[1]['etag']}]})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual((data['status'], data['size']), ('complete', 11))
+        self.assertEqual(processed, [(upload['key'], 'image/png')])
+        self.assertEqual(self.client.put(f'{base}/parts/3', data=b'!').status_code, 409)
+        
+        # The stable URL redirects to a signed one; tampering is refused
+        response = self.client.get(data['url'])
+        self.assertEqual(response.status_code, 302)
+        signed = response.headers['Location']
+        self.assertEqual(self.client.get(signed).data, b'hello world')
+        self.assertEqual(self.client.get(signed.replace('signature=', 'signature=x')).status_code, 403)
+        
+        self.app.config['MEDIA_ACCEL_REDIRECT'] = '/protected-media'
+        response = self.client.get(signed)
+        self.assertEqual(response.headers['X-Accel-Redirect'], f"/protected-media/{upload['key']}")
+        self.assertEqual(response.data, b'')
+        
+        # Someone else's upload is invisible
+        flask.g.pop('_login_user', None)
+        other = User(username='other', email='other@example.com')
+        db.session.add(other)
+        db.session.commit()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(other.id)
+        self.assertEqual(self.client.get(base).status_code, 404)
+    
+    def test_course_listing_defers_content(self):
+        response = self.client.get('/api/courses?per_page=1&include=description')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['courses'][0]['description'], 'Test Description')
+        self.assertNotIn('content', data['courses'][0])
+        
+        response = self.client.get(f'/api/courses/{self.course.id}')
+        self.assertNotIn('content', response.get_json())
+        response = self.client.get(f'/api/courses/{self.course.id}?include=content')
+        self.assertEqual(response.get_json()['content'], self.course.content)
+    
+    def test_course_content_ranges(self):
+        body = self.course.content.encode()
+        self.app.config['COURSE_CONTENT_CHUNK_SIZE'] = 4
+        url = f'/api/courses/{self.course.id}/content'
+        
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(response.data, body)
+        
+        # Each chunk is its own read: the length, then two 4-byte pieces
+        with count_queries() as queries:
+            response = self.client.get(url, headers={'Range': 'bytes=11-17'})
+            self.assertEqual(response.data, body[11:18])
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], f'bytes 11-17/{len(body)}')
+        self.assertEqual(queries.count, 3)
+        
+        response = self.client.get(url, headers={'Range': 'bytes=-5'})
+        self.assertEqual(response.data, body[-5:])
+        
+        # Multiple ranges aren't supported, so the whole body is sent
+        response = self.client.get(url, headers={'Range': 'bytes=0-1,4-5'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, body)
+        
+        response = self.client.get(url, headers={'Range': f'bytes={len(body)}-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], f'bytes */{len(body)}')
+        
+        self.assertEqual(self.client.get('/api/courses/999/content').status_code, 404)
+    
+    def test_progress_is_buffered_and_coalesced(self):
+        self.login()
+        self.client.post(f'/api/courses/{self.course.id}/enroll')
+        other = Course(title='Other Course', description='Other', content='Other')
+        db.session.add(other)
+        db.session.commit()
+        self.client.post(f'/api/courses/{other.id}/enroll')
+        url = f'/api/courses/{self.course.id}/progress'
+        
+        self.assertEqual(self.client.post(url, json={'progress': 10}).status_code, 200)
+        # Later pings don't recheck the enrollment and nothing is written yet
+        with count_queries() as queries:
+            for progress in (20, 30):
+                flask.g.pop('_login_user', None)
+                response = self.client.post(url, json={'progress': progress})
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries.count, 0)
+        
+        response = self.client.post('/api/courses/progress', json={'updates': [
+            {'course_id': other.id, 'progress': 0},
+            {'course_id': self.course.id, 'progress': 40},
+            {'course_id': other.id, 'progress': 5},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['updated'], 2)
+        
+        self.assertEqual(progress_buffer.flush(), 2)
+        progress = dict(db.session.execute(
+            db.select(CourseEnrollment.course_id, CourseEnrollment.progress)
+            .where(CourseEnrollment.user_id == self.user.id)
+        ).all())
+        self.assertEqual(progress, {self.course.id: 40, other.id: 5})
+        self.assertEqual(progress_buffer.flush(), 0)
+    
+    def test_progress_requires_enrollment(self):
+        self.login()
+        response = self.client.post(f'/api/courses/{self.course.id}/progress',
+                                    json={'progress': 10})
+        self.assertEqual(response.status_code, 404)
+        
+        response = self.client.post('/api/courses/progress', json={'updates': [
+            {'course_id': self.course.id, 'progress': 10}
+        ]})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json()['course_ids'], [self.course.id])
+        
+        response = self.client.post('/api/courses/progress', json={'updates': [
+            {'course_id': self.course.id, 'progress': 101}
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(progress_buffer.flush(), 0)
+    
     def test_get_courses(self):
         response = self.client.get('/api/courses')
         self.assertEqual(response.status_code, 200)